@@ -7,6 +7,10 @@ from pathlib import Path
 import sys
 
 
+# データソース選択肢（入力値 → DATA_SOURCE の値）
+_CHOICES = {"1": "google_drive", "2": "sharepoint"}
+
+
 def create_env_file():
     """対話式で.envファイルを作成"""
     print("=" * 80)
@@ -39,12 +43,11 @@ def create_env_file():
     
     while True:
         choice = input("選択 (1 or 2): ").strip()
-        if choice in ["1", "2"]:
+        data_source = _CHOICES.get(choice)
+        if data_source:
             break
         print("1 または 2 を入力してください")
     
-    data_source = "google_drive" if choice == "1" else "sharepoint"
-    
     # データソース別の設定
     google_folder_id = ""
     sharepoint_site_url = ""
@@ -112,8 +115,7 @@ LOG_LEVEL=INFO
 LOG_PATH=./logs
 """
     
-    with open(env_file, 'w', encoding='utf-8') as f:
-        f.write(env_content)
+    env_file.write_text(env_content, encoding='utf-8')
     
     print("\n" + "=" * 80)
     print("✓ .envファイルを作成しました！")
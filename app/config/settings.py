@@ -5,27 +5,93 @@
 
 import os
 import logging
+import functools
+import threading
+from functools import cached_property
 from pathlib import Path
-from typing import Literal, Optional
-from dotenv import load_dotenv
+from typing import Callable, Dict, Literal, Optional, Set, Tuple
 
 # ロガーの設定
 logger = logging.getLogger(__name__)
 
 # プロジェクトルートのパスを取得
+# （インポート時に一度だけ resolve し、以降のパス検証で再利用する）
 PROJECT_ROOT = Path(__file__).parent.parent.resolve()
 
-# .envファイルを読み込み（絶対パスで指定）
-env_path = PROJECT_ROOT / ".env"
-if not env_path.exists():
+# .envファイルの候補（絶対パスで指定、先に存在するものを使用）
+_ENV_PATH_CANDIDATES = (
+    PROJECT_ROOT / ".env",
     # フォールバック: 明示的な絶対パスで試す
-    env_path = Path("/Users/tetsuroh/Documents/議事メモツール/.env")
+    Path("/Users/tetsuroh/Documents/議事メモツール/.env"),
+)
 
-# 必ず読み込む（エラーを明示的にする）
-if not load_dotenv(env_path, override=True):
-    logger.error(f".envファイルの読み込みに失敗: {env_path}")
-else:
-    logger.info(f".envファイルを読み込みました: {env_path}")
+
+def _env_file_stamp() -> Optional[Tuple[str, int]]:
+    """
+    使用する.envファイルの (パス, 更新時刻) を返す
+    
+    Returns:
+        (パス, 更新時刻ナノ秒)。どの候補も存在しない場合はNone
+    """
+    for env_path in _ENV_PATH_CANDIDATES:
+        try:
+            return str(env_path), env_path.stat().st_mtime_ns
+        except OSError:
+            continue
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _load_env(path: str, mtime_ns: int) -> Dict[str, str]:
+    """
+    .envファイルをパースして辞書で返す（(パス, 更新時刻)でキャッシュ）
+    
+    Args:
+        path: .envファイルのパス
+        mtime_ns: ファイルの更新時刻（ナノ秒）。変更検知用のキャッシュキー
+    
+    Returns:
+        値が設定されているキーのみを含む辞書
+    """
+    # インポート時のコストを避けるため、実際に読み込む時点でインポート
+    from dotenv import dotenv_values
+    
+    return {key: value for key, value in dotenv_values(path).items() if value is not None}
+
+
+# .envの読み込み済みフラグと、最後に os.environ へ反映した (パス, 更新時刻)
+_env_loaded = False
+_applied_env_key: Optional[Tuple[str, int]] = None
+
+
+def _ensure_env_loaded() -> None:
+    """
+    .envファイルを os.environ に反映する（冪等）
+    
+    モジュールのインポート時ではなく、最初の Settings 生成時に呼び出されます。
+    load_dotenv(override=True) と同じく .env の値を優先しますが、
+    同じ (パス, 更新時刻) に対しては再パース・再反映を行いません。
+    reset_settings() 後は更新時刻を確認し直します。
+    """
+    global _env_loaded, _applied_env_key
+    
+    if _env_loaded:
+        return
+    _env_loaded = True
+    
+    key = _env_file_stamp()
+    if key is None:
+        # 必ず読み込む前提のため、失敗は明示的にログに残す
+        if _applied_env_key is None:
+            logger.error(f".envファイルの読み込みに失敗: {_ENV_PATH_CANDIDATES[-1]}")
+        return
+    
+    if key == _applied_env_key:
+        return
+    
+    os.environ.update(_load_env(*key))
+    _applied_env_key = key
+    logger.info(f".envファイルを読み込みました: {key[0]}")
 
 
 class ConfigurationError(Exception):
@@ -48,84 +114,193 @@ class Settings:
     MAX_CHUNK_OVERLAP = 5000
     MIN_TOP_K = 1
     MAX_TOP_K = 100
+    MIN_EMBEDDING_DIMENSIONS = 1
+    MAX_EMBEDDING_DIMENSIONS = 3072
+    
+    # 有効なデータソース（ホワイトリスト）
+    VALID_DATA_SOURCES = frozenset({"google_drive", "sharepoint"})
+    
+    # 作成済みディレクトリ（インスタンス間で mkdir の重複を避ける）
+    _created_dirs: Set[Path] = set()
     
     def __init__(self):
         """
-        設定を初期化し、厳格なバリデーションを行う
+        設定を初期化し、必須項目のバリデーションを行う
+        
+        APIキー・データソース・チャンク設定の整合性は生成時に検証します。
+        その他の項目は初回アクセス時に検証し、ディレクトリ作成も
+        対応するパスに初めてアクセスした時点まで遅延します。
         
         Raises:
             ConfigurationError: 設定値が不正な場合
         """
+        # .envが更新されている場合のみ再反映し、環境変数は一度だけ辞書に写す
+        _ensure_env_loaded()
+        env = self._env = dict(os.environ)
+        
         # OpenAI API設定（厳格なバリデーション）
         self.openai_api_key = self._validate_api_key(
-            os.getenv("OPENAI_API_KEY", "")
+            env.get("OPENAI_API_KEY", "")
         )
         
         # データソースの選択（ホワイトリスト方式）
         self.data_source = self._validate_data_source(
-            os.getenv("DATA_SOURCE", "google_drive")
+            env.get("DATA_SOURCE", "google_drive")
         )
         
-        # Google Drive設定
-        self.google_drive_folder_id = os.getenv("GOOGLE_DRIVE_FOLDER_ID", "")
-        # credentials.jsonのパス（存在確認付き）
+        # 論理的整合性のチェック（chunk_size / chunk_overlap を検証）
+        self._validate_chunk_configuration()
+    
+    # Google Drive設定
+    @cached_property
+    def google_drive_folder_id(self) -> str:
+        return self._env.get("GOOGLE_DRIVE_FOLDER_ID", "")
+    
+    @cached_property
+    def google_credentials_path(self) -> Path:
+        """credentials.jsonのパス（存在確認付き）"""
         credentials_path = PROJECT_ROOT / "credentials.json"
         if not credentials_path.exists():
             # フォールバック: 絶対パス
             credentials_path = Path("/Users/tetsuroh/Documents/議事メモツール/credentials.json")
-        self.google_credentials_path = credentials_path
-        self.google_token_path = PROJECT_ROOT / "token.json"
-        
-        # SharePoint設定
-        self.sharepoint_site_url = os.getenv("SHAREPOINT_SITE_URL", "")
-        self.sharepoint_folder_path = os.getenv("SHAREPOINT_FOLDER_PATH", "")
-        self.sharepoint_client_id = os.getenv("SHAREPOINT_CLIENT_ID", "")
-        self.sharepoint_client_secret = os.getenv("SHAREPOINT_CLIENT_SECRET", "")
-        self.sharepoint_tenant_id = os.getenv("SHAREPOINT_TENANT_ID", "")
-        
-        # ベクターストア設定（パストラバーサル対策）
-        self.vector_store_path = self._validate_and_resolve_path(
-            os.getenv("VECTOR_STORE_PATH", str(PROJECT_ROOT / "chroma_db")),
-            "VECTOR_STORE_PATH"
-        )
-        self.metadata_path = self._validate_and_resolve_path(
-            os.getenv("METADATA_PATH", str(PROJECT_ROOT / "data" / "metadata")),
-            "METADATA_PATH"
+        return credentials_path
+    
+    @cached_property
+    def google_credentials_available(self) -> bool:
+        """credentials.jsonが空でないファイルとして存在するか（インスタンスごとに1回だけ確認）"""
+        try:
+            return os.stat(self.google_credentials_path).st_size > 0
+        except OSError:
+            return False
+    
+    @cached_property
+    def google_token_path(self) -> Path:
+        return PROJECT_ROOT / "token.json"
+    
+    # SharePoint設定
+    @cached_property
+    def sharepoint_site_url(self) -> str:
+        return self._env.get("SHAREPOINT_SITE_URL", "")
+    
+    @cached_property
+    def sharepoint_folder_path(self) -> str:
+        return self._env.get("SHAREPOINT_FOLDER_PATH", "")
+    
+    @cached_property
+    def sharepoint_client_id(self) -> str:
+        return self._env.get("SHAREPOINT_CLIENT_ID", "")
+    
+    @cached_property
+    def sharepoint_client_secret(self) -> str:
+        return self._env.get("SHAREPOINT_CLIENT_SECRET", "")
+    
+    @cached_property
+    def sharepoint_tenant_id(self) -> str:
+        return self._env.get("SHAREPOINT_TENANT_ID", "")
+    
+    # ベクターストア設定（パストラバーサル対策、初回アクセス時に作成）
+    @cached_property
+    def vector_store_path(self) -> Path:
+        return self._ensure_directory(self._env_or_path(
+            "VECTOR_STORE_PATH", lambda: PROJECT_ROOT / "chroma_db"
+        ))
+    
+    @cached_property
+    def metadata_path(self) -> Path:
+        return self._ensure_directory(self._env_or_path(
+            "METADATA_PATH", lambda: PROJECT_ROOT / "data" / "metadata"
+        ))
+    
+    # RAG設定（数値パラメータの厳格なバリデーション）
+    @cached_property
+    def embedding_model(self) -> str:
+        return self._env.get("EMBEDDING_MODEL", "text-embedding-3-small")
+    
+    @cached_property
+    def embedding_dimensions(self) -> Optional[int]:
+        # 未設定の場合はモデルの既定の次元数
+        if self._env.get("EMBEDDING_DIMENSIONS") is None:
+            return None
+        return self._validate_positive_int(
+            self._env, "EMBEDDING_DIMENSIONS", 0,
+            min_value=self.MIN_EMBEDDING_DIMENSIONS,
+            max_value=self.MAX_EMBEDDING_DIMENSIONS
         )
-        
-        # RAG設定（数値パラメータの厳格なバリデーション）
-        self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-        self.chat_model = os.getenv("CHAT_MODEL", "gpt-4o-mini")
-        self.chunk_size = self._validate_positive_int(
-            "CHUNK_SIZE", 1000, 
+    
+    @cached_property
+    def chat_model(self) -> str:
+        return self._env.get("CHAT_MODEL", "gpt-4o-mini")
+    
+    @cached_property
+    def chunk_size(self) -> int:
+        return self._validate_positive_int(
+            self._env, "CHUNK_SIZE", 1000, 
             min_value=self.MIN_CHUNK_SIZE, 
             max_value=self.MAX_CHUNK_SIZE
         )
-        self.chunk_overlap = self._validate_positive_int(
-            "CHUNK_OVERLAP", 200,
+    
+    @cached_property
+    def chunk_overlap(self) -> int:
+        return self._validate_positive_int(
+            self._env, "CHUNK_OVERLAP", 200,
             min_value=self.MIN_CHUNK_OVERLAP,
             max_value=self.MAX_CHUNK_OVERLAP
         )
-        self.top_k_results = self._validate_positive_int(
-            "TOP_K_RESULTS", 5,
+    
+    @cached_property
+    def top_k_results(self) -> int:
+        return self._validate_positive_int(
+            self._env, "TOP_K_RESULTS", 5,
             min_value=self.MIN_TOP_K,
             max_value=self.MAX_TOP_K
         )
+    
+    # ログ設定（パストラバーサル対策、初回アクセス時に作成）
+    @cached_property
+    def log_level(self) -> str:
+        return self._env.get("LOG_LEVEL", "INFO")
+    
+    @cached_property
+    def log_path(self) -> Path:
+        return self._ensure_directory(self._env_or_path(
+            "LOG_PATH", lambda: PROJECT_ROOT / "logs"
+        ))
+    
+    def _env_or_path(self, key: str, default_factory: Callable[[], Path]) -> Path:
+        """
+        環境変数のパスを検証して返す（未設定の場合のみデフォルトを生成）
         
-        # 論理的整合性のチェック
-        self._validate_chunk_configuration()
+        デフォルトはプロジェクトルート配下の絶対パスのため検証を省略します。
         
-        # ログ設定（パストラバーサル対策）
-        self.log_level = os.getenv("LOG_LEVEL", "INFO")
-        self.log_path = self._validate_and_resolve_path(
-            os.getenv("LOG_PATH", str(PROJECT_ROOT / "logs")),
-            "LOG_PATH"
-        )
+        Args:
+            key: 環境変数のキー
+            default_factory: 未設定時にデフォルトパスを返す関数
+        
+        Returns:
+            検証済みの絶対パス
         
-        # ディレクトリが存在しない場合は作成
-        self.vector_store_path.mkdir(parents=True, exist_ok=True)
-        self.metadata_path.mkdir(parents=True, exist_ok=True)
-        self.log_path.mkdir(parents=True, exist_ok=True)
+        Raises:
+            ConfigurationError: 設定されたパスが不正な場合
+        """
+        value = self._env.get(key)
+        if value is None:
+            return default_factory()
+        return self._validate_and_resolve_path(value, key)
+    
+    def _ensure_directory(self, path: Path) -> Path:
+        """
+        ディレクトリが存在しない場合は作成する（作成済みならスキップ）
+        
+        Args:
+            path: 作成するディレクトリ
+        
+        Returns:
+            引数のパス
+        """
+        if path not in self._created_dirs:
+            path.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(path)
+        return path
     
     def _validate_api_key(self, api_key: str) -> str:
         """
@@ -175,30 +350,31 @@ class Settings:
         Raises:
             ConfigurationError: データソースが不正な場合
         """
-        valid_sources = ["google_drive", "sharepoint"]
         data_source = data_source.strip().lower()
         
-        if data_source not in valid_sources:
+        if data_source not in self.VALID_DATA_SOURCES:
             raise ConfigurationError(
                 f"DATA_SOURCE が不正です: '{data_source}'。"
-                f"有効な値: {', '.join(valid_sources)}"
+                f"有効な値: {', '.join(sorted(self.VALID_DATA_SOURCES))}"
             )
         return data_source
     
     def _validate_positive_int(
         self, 
+        env: Dict[str, str],
         key: str, 
         default: int,
-        min_value: Optional[int] = None,
+        min_value: int = 1,
         max_value: Optional[int] = None
     ) -> int:
         """
         正の整数をバリデーション
         
         Args:
+            env: 環境変数の辞書
             key: 環境変数のキー
-            default: デフォルト値
-            min_value: 最小値（Noneの場合は1）
+            default: デフォルト値（キーが未設定の場合に使用）
+            min_value: 最小値
             max_value: 最大値（Noneの場合は制限なし）
         
         Returns:
@@ -207,24 +383,25 @@ class Settings:
         Raises:
             ConfigurationError: 値が不正な場合
         """
-        min_value = min_value if min_value is not None else 1
-        
-        # 環境変数の取得
-        value_str = os.getenv(key, str(default))
-        
-        # 空文字列チェック
-        if not value_str or not value_str.strip():
-            raise ConfigurationError(
-                f"{key} が空です。有効な整数値を設定してください。"
-            )
-        
-        # 整数への変換
-        try:
-            value = int(value_str.strip())
-        except ValueError as e:
-            raise ConfigurationError(
-                f"{key} の値が整数ではありません: '{value_str}'"
-            ) from e
+        # 環境変数の取得（未設定ならデフォルト値）
+        value_str = env.get(key)
+        if value_str is None:
+            value = default
+        else:
+            # 空文字列チェック（stripは一度だけ）
+            stripped = value_str.strip()
+            if not stripped:
+                raise ConfigurationError(
+                    f"{key} が空です。有効な整数値を設定してください。"
+                )
+            
+            # 整数への変換
+            try:
+                value = int(stripped)
+            except ValueError as e:
+                raise ConfigurationError(
+                    f"{key} の値が整数ではありません: '{value_str}'"
+                ) from e
         
         # 最小値チェック
         if value < min_value:
@@ -273,20 +450,14 @@ class Settings:
             raise ConfigurationError(f"{key} が空です")
         
         # 絶対パスに解決（パストラバーサル対策）
-        path = Path(path_str.strip()).resolve()
+        path = Path(os.path.abspath(path_str.strip()))
         
-        # プロジェクトルート配下にあることを確認（セキュリティチェック）
-        try:
-            project_root_resolved = PROJECT_ROOT.resolve()
-            
-            # プロジェクトルート配下でない場合は警告
-            if not str(path).startswith(str(project_root_resolved)):
-                logger.warning(
-                    f"{key} がプロジェクトルート外を指しています: {path}。"
-                    "セキュリティリスクがある可能性があります。"
-                )
-        except Exception as e:
-            logger.error(f"パスの検証中にエラーが発生: {e}")
+        # プロジェクトルート配下でない場合は警告（セキュリティチェック）
+        if not path.is_relative_to(PROJECT_ROOT):
+            logger.warning(
+                f"{key} がプロジェクトルート外を指しています: {path}。"
+                "セキュリティリスクがある可能性があります。"
+            )
         
         return path
     
@@ -302,7 +473,7 @@ class Settings:
             return False
         
         # 認証ファイルの存在確認
-        if not self.google_credentials_path.exists():
+        if not self.google_credentials_available:
             return False
         
         return True
@@ -314,25 +485,28 @@ class Settings:
         Returns:
             設定が有効な場合True
         """
-        required_fields = [
+        required_fields = (
             (self.sharepoint_site_url, "SHAREPOINT_SITE_URL"),
             (self.sharepoint_folder_path, "SHAREPOINT_FOLDER_PATH"),
             (self.sharepoint_client_id, "SHAREPOINT_CLIENT_ID"),
             (self.sharepoint_client_secret, "SHAREPOINT_CLIENT_SECRET"),
             (self.sharepoint_tenant_id, "SHAREPOINT_TENANT_ID"),
-        ]
+        )
         
-        for field_value, field_name in required_fields:
-            # 空文字列チェック
-            if not field_value:
-                return False
-            
-            # スペースのみチェック
-            if not field_value.strip():
-                logger.warning(f"{field_name} が空白文字のみです")
-                return False
+        # 空文字列・スペースのみを一括チェック（通常はここで終わる）
+        if all(field_value and field_value.strip() for field_value, _ in required_fields):
+            return True
         
-        return True
+        # 失敗時のみ、スペースのみのフィールドを警告
+        if logger.isEnabledFor(logging.WARNING):
+            for field_value, field_name in required_fields:
+                if not field_value:
+                    break
+                if not field_value.strip():
+                    logger.warning(f"{field_name} が空白文字のみです")
+                    break
+        
+        return False
     
     def validate_current_data_source(self) -> bool:
         """
@@ -349,21 +523,37 @@ class Settings:
             return False
 
 
-# シングルトンインスタンス
-_settings_instance = None
+# シングルトン生成の排他制御（lru_cache 単体では初回の同時呼び出しで二重生成され得る）
+_settings_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _make_settings(env_stamp: Optional[Tuple[str, int]]) -> Settings:
+    """
+    Settings を生成する（.envの (パス, 更新時刻) ごとにキャッシュ）
+    
+    .envが変更されていなければ検証済みのインスタンスをそのまま再利用し、
+    変更されていれば読み込み直して新しいインスタンスを生成します。
+    
+    Args:
+        env_stamp: _env_file_stamp() の戻り値（キャッシュキー）
+    """
+    global _env_loaded
+    _env_loaded = False
+    return Settings()
 
 
 def get_settings() -> Settings:
     """
-    設定のシングルトンインスタンスを取得
+    設定のシングルトンインスタンスを取得（スレッドセーフ）
+    
+    .envファイルが更新された場合は新しい設定で再初期化されます。
     
     Returns:
         Settings インスタンス
     """
-    global _settings_instance
-    if _settings_instance is None:
-        _settings_instance = Settings()
-    return _settings_instance
+    with _settings_lock:
+        return _make_settings(_env_file_stamp())
 
 
 def reset_settings():
@@ -373,5 +563,7 @@ def reset_settings():
     テスト時に環境変数を変更した後、この関数を呼び出すことで
     新しい設定で再初期化できます。
     """
-    global _settings_instance
-    _settings_instance = None
+    global _env_loaded
+    with _settings_lock:
+        _make_settings.cache_clear()
+        _env_loaded = False
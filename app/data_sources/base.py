@@ -5,25 +5,105 @@ Google DriveとSharePointの実装を統一的に扱うためのインターフ
 
 import hashlib
 import logging
+import re
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from typing import Callable, ClassVar, List, Dict, Hashable, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 
+from ..utils.diff_detector import DiffDetector
+
 logger = logging.getLogger(__name__)
 
+# 内容を取得できなかった場合のハッシュ（空文字列のSHA256）
+EMPTY_CONTENT_HASH = hashlib.sha256(b"").hexdigest()
+
+# 名前に含まれると警告する文字（XSS対策）
+_DANGEROUS_CHARS_RE = re.compile(r"""[<>"']""")
+
+# 現在時刻のキャッシュ（(取得時のmonotonic値, UTC現在時刻)）
+_NOW_CACHE_TTL = 1.0
+_now_cache: Tuple[float, Optional[datetime]] = (0.0, None)
+
+
+def _cached_utc_now() -> datetime:
+    """
+    UTCの現在時刻を返す（1秒間キャッシュ）
+    
+    未来日時の検出は時計ずれの警告目的のため秒単位の精度で十分であり、
+    大量のドキュメント生成時に毎回 datetime.now() を呼ばずに済みます。
+    
+    Returns:
+        UTCの現在時刻
+    """
+    global _now_cache
+    cached_at, cached_now = _now_cache
+    current = time.monotonic()
+    if cached_now is None or current - cached_at >= _NOW_CACHE_TTL:
+        cached_now = datetime.now(timezone.utc)
+        _now_cache = (current, cached_now)
+    return cached_now
+
 
 class DocumentValidationError(Exception):
     """ドキュメント検証エラー用のカスタム例外"""
     pass
 
 
-@dataclass
+def _has_parent_reference(value: str) -> bool:
+    """
+    パス要素として ".." が含まれるかを判定（パストラバーサル対策）
+    
+    "my..project" のような名前は許可し、区切り文字で分割した要素が
+    ".." と一致する場合のみ検出します。Windows形式の区切り文字も考慮します。
+    
+    Args:
+        value: 検査する文字列
+    
+    Returns:
+        親ディレクトリ参照が含まれる場合True
+    """
+    if ".." not in value:
+        return False
+    return DiffDetector.PARENT_REFERENCE.search(value) is not None
+
+
+def parse_rfc3339(value: str) -> datetime:
+    """
+    APIが返すUTC日時文字列（"YYYY-MM-DDTHH:MM:SS[.fff]Z"）を解析
+    
+    Python 3.11 以降の fromisoformat は末尾の "Z" をそのまま解析できるため、
+    文字列を置換せずにC実装のパーサーへ直接渡します（それ以前のバージョンでは置換して再解析）。
+    
+    Args:
+        value: 日時文字列
+    
+    Returns:
+        タイムゾーン付きの日時
+    
+    Raises:
+        ValueError: 日時として解析できない場合
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        if not value.endswith("Z"):
+            raise
+        return datetime.fromisoformat(value[:-1] + "+00:00")
+
+
+@dataclass(slots=True, frozen=True)
 class DocumentInfo:
     """
     ドキュメント情報（堅牢版）
     
     すべてのフィールドに対して厳格な型チェックとバリデーションを行います。
+    一覧取得で大量に生成されるため __slots__ 化して __dict__ を持ちません。
+    生成後は変更できません（検証時の正規化のみ object.__setattr__ で行います）。
     
     Attributes:
         file_id: ファイルID（一意な識別子）
@@ -38,11 +118,11 @@ class DocumentInfo:
         DocumentValidationError: フィールドが不正な場合
     """
     
-    # 定数定義
-    MAX_CONTENT_SIZE = 10 * 1024 * 1024  # 10MB
-    MAX_FILE_ID_LENGTH = 1000
-    MAX_NAME_LENGTH = 1000
-    MAX_PATH_LENGTH = 2000
+    # 定数定義（ClassVar のためスロット化・フィールド化の対象外）
+    MAX_CONTENT_SIZE: ClassVar[int] = 10 * 1024 * 1024  # 10MB
+    MAX_FILE_ID_LENGTH: ClassVar[int] = 1000
+    MAX_NAME_LENGTH: ClassVar[int] = 1000
+    MAX_PATH_LENGTH: ClassVar[int] = 2000
     
     file_id: str
     name: str
@@ -50,7 +130,7 @@ class DocumentInfo:
     modified_time: datetime
     folder_path: str
     content_hash: str = ""
-    metadata: Dict[str, any] = field(default_factory=dict)
+    metadata: Dict[str, any] = field(default_factory=dict, hash=False)
     
     def __post_init__(self):
         """
@@ -61,26 +141,15 @@ class DocumentInfo:
         Raises:
             DocumentValidationError: フィールドが不正な場合
         """
-        # file_id の検証
-        self._validate_file_id()
-        
-        # name の検証
-        self._validate_name()
-        
-        # content の検証
-        self._validate_content()
-        
-        # modified_time の検証
-        self._validate_modified_time()
-        
-        # folder_path の検証
-        self._validate_folder_path()
+        # 単独で完結するフィールドの検証（file_id, name, modified_time, folder_path, metadata）
+        for validate in self._FIELD_VALIDATORS:
+            validate(self)
         
-        # metadata の検証
-        self._validate_metadata()
+        # content の検証（エンコード結果はハッシュ計算で再利用）
+        content_bytes = self._validate_content()
         
         # content_hash の検証または自動計算
-        self._validate_or_compute_hash()
+        self._validate_or_compute_hash(content_bytes)
     
     def _validate_file_id(self):
         """file_id のバリデーション"""
@@ -98,7 +167,7 @@ class DocumentInfo:
             )
         
         # パストラバーサル対策
-        if ".." in self.file_id:
+        if _has_parent_reference(self.file_id):
             raise DocumentValidationError(
                 "Path traversal detected in file_id: '..' is not allowed"
             )
@@ -119,15 +188,23 @@ class DocumentInfo:
             )
         
         # 危険な文字のチェック（XSS対策）
-        dangerous_chars = ['<', '>', '"', "'"]
-        for char in dangerous_chars:
-            if char in self.name:
-                logger.warning(
-                    f"Potentially dangerous character '{char}' found in name: {self.name}"
-                )
-    
-    def _validate_content(self):
-        """content のバリデーション"""
+        match = _DANGEROUS_CHARS_RE.search(self.name)
+        if match:
+            logger.warning(
+                f"Potentially dangerous character '{match.group()}' found in name: {self.name}"
+            )
+    
+    def _validate_content(self) -> Optional[bytes]:
+        """
+        content のバリデーション
+        
+        UTF-8は1文字あたり最大4バイトのため、文字数だけで判定できる場合は
+        エンコードを行いません。
+        
+        Returns:
+            UTF-8エンコード済みのコンテンツ（エンコードした場合のみ。
+            ハッシュ計算で再利用するため）
+        """
         if not isinstance(self.content, str):
             raise DocumentValidationError(
                 f"content must be a string, got {type(self.content).__name__}"
@@ -135,13 +212,27 @@ class DocumentInfo:
         
         # 空のコンテンツは許可（空ファイルの可能性）
         
-        # サイズ制限チェック
-        content_size = len(self.content.encode('utf-8'))
+        # サイズ制限チェック（文字数で確定できない範囲のみエンコード）
+        char_count = len(self.content)
+        if char_count * 4 <= self.MAX_CONTENT_SIZE:
+            return None
+        
+        # 文字数が上限を超えていればバイト数も必ず超える
+        if char_count > self.MAX_CONTENT_SIZE:
+            raise DocumentValidationError(
+                f"Content size exceeds limit: at least {char_count} bytes "
+                f"(max: {self.MAX_CONTENT_SIZE} bytes = {self.MAX_CONTENT_SIZE // (1024*1024)}MB)"
+            )
+        
+        content_bytes = self.content.encode('utf-8')
+        content_size = len(content_bytes)
         if content_size > self.MAX_CONTENT_SIZE:
             raise DocumentValidationError(
                 f"Content size exceeds limit: {content_size} bytes "
                 f"(max: {self.MAX_CONTENT_SIZE} bytes = {self.MAX_CONTENT_SIZE // (1024*1024)}MB)"
             )
+        
+        return content_bytes
     
     def _validate_modified_time(self):
         """modified_time のバリデーション"""
@@ -151,7 +242,7 @@ class DocumentInfo:
             )
         
         # 未来の日時チェック（異常なタイムスタンプの検出）
-        now = datetime.now(timezone.utc)
+        now = _cached_utc_now()
         if self.modified_time > now:
             logger.warning(
                 f"modified_time is in the future: {self.modified_time} > {now}. "
@@ -173,16 +264,19 @@ class DocumentInfo:
             )
         
         # パストラバーサル対策
-        if ".." in self.folder_path:
+        if _has_parent_reference(self.folder_path):
             raise DocumentValidationError(
                 "Path traversal detected in folder_path: '..' is not allowed"
             )
+        
+        # 同じフォルダのドキュメント間で文字列を共有（大量生成時のメモリ削減）
+        object.__setattr__(self, "folder_path", sys.intern(self.folder_path))
     
     def _validate_metadata(self):
         """metadata のバリデーション"""
         # None の場合は空の辞書に変換
         if self.metadata is None:
-            self.metadata = {}
+            object.__setattr__(self, "metadata", {})
         
         # 型チェック
         if not isinstance(self.metadata, dict):
@@ -190,11 +284,20 @@ class DocumentInfo:
                 f"metadata must be a dictionary, got {type(self.metadata).__name__}"
             )
     
-    def _validate_or_compute_hash(self):
-        """content_hash の検証または自動計算"""
+    def _validate_or_compute_hash(self, content_bytes: Optional[bytes] = None):
+        """
+        content_hash の検証または自動計算
+        
+        ハッシュが指定されている場合は形式のみを確認し、内容との照合は
+        行いません（再計算のコストを避けるため）。整合性を確認したい場合は
+        verify_hash() を明示的に呼び出してください。
+        
+        Args:
+            content_bytes: エンコード済みのコンテンツ（Noneの場合は再エンコード）
+        """
         # ハッシュが指定されていない場合は自動計算
         if not self.content_hash:
-            self.content_hash = self._calculate_hash()
+            object.__setattr__(self, "content_hash", self._calculate_hash(content_bytes))
             return
         
         # ハッシュが指定されている場合は型チェック
@@ -209,24 +312,29 @@ class DocumentInfo:
                 f"content_hash length is {len(self.content_hash)}, "
                 "expected 64 for SHA256. Hash may not be valid."
             )
-        
-        # オプション：ハッシュの整合性チェック
-        # 計算したハッシュと一致するか確認（パフォーマンス影響あり）
-        computed_hash = self._calculate_hash()
-        if self.content_hash != computed_hash:
-            logger.warning(
-                f"Provided content_hash does not match computed hash. "
-                f"Provided: {self.content_hash[:16]}..., Computed: {computed_hash[:16]}..."
-            )
     
-    def _calculate_hash(self) -> str:
+    def _calculate_hash(self, content_bytes: Optional[bytes] = None) -> str:
         """
         コンテンツのSHA256ハッシュを計算
         
+        Args:
+            content_bytes: エンコード済みのコンテンツ（Noneの場合はここでエンコード）
+        
         Returns:
             64文字の16進数ハッシュ値
         """
-        return hashlib.sha256(self.content.encode('utf-8')).hexdigest()
+        if content_bytes is None:
+            content_bytes = self.content.encode('utf-8')
+        return hashlib.sha256(content_bytes).hexdigest()
+    
+    # __post_init__ で順に実行する検証関数（メソッド探索を毎回行わないよう事前に束ねる）
+    _FIELD_VALIDATORS: ClassVar[Tuple[Callable[["DocumentInfo"], None], ...]] = (
+        _validate_file_id,
+        _validate_name,
+        _validate_modified_time,
+        _validate_folder_path,
+        _validate_metadata,
+    )
     
     def verify_hash(self) -> bool:
         """
@@ -238,9 +346,63 @@ class DocumentInfo:
         return self.content_hash == self._calculate_hash()
 
 
+class ContentCache:
+    """
+    ダウンロード済みドキュメント内容のLRUキャッシュ（スレッドセーフ）
+    
+    キーには (ファイルID, 更新日時) を使うことで、ファイルが更新されると
+    古い内容は参照されなくなります。
+    """
+    
+    def __init__(self, max_entries: int = 256):
+        """
+        Args:
+            max_entries: 保持する最大件数
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Tuple[str, str]]:
+        """
+        キャッシュされた (内容, ハッシュ) を取得
+        
+        Args:
+            key: キャッシュキー
+        
+        Returns:
+            (内容, ハッシュ)。キャッシュに無い場合はNone
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: Hashable, value: Tuple[str, str]) -> None:
+        """
+        (内容, ハッシュ) をキャッシュに追加（上限を超えた場合は最も古いものを破棄）
+        
+        Args:
+            key: キャッシュキー
+            value: (内容, ハッシュ)
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class DataSourceBase(ABC):
     """データソース抽象基底クラス"""
     
+    # 前回取り込み時のファイル情報（set_known_documents で設定）
+    _known_documents: Dict[str, dict] = {}
+    
     @abstractmethod
     def authenticate(self) -> bool:
         """
@@ -254,7 +416,9 @@ class DataSourceBase(ABC):
     @abstractmethod
     def list_documents(self, folder_path: Optional[str] = None) -> List[DocumentInfo]:
         """
-        ドキュメント一覧を取得
+        ドキュメント一覧を取得（サブフォルダ配下を含む）
+        
+        実装クラスはサブフォルダを辿り、配下のすべてのドキュメントを返すこと。
         
         Args:
             folder_path: フォルダパス（Noneの場合はルート）
@@ -292,12 +456,54 @@ class DataSourceBase(ABC):
     
     def get_all_documents_recursive(self, root_folder: Optional[str] = None) -> List[DocumentInfo]:
         """
-        全てのドキュメントを再帰的に取得
+        全てのドキュメントを取得（互換性のための別名）
+        
+        このメソッド自体は再帰処理を行わず、list_documents() をそのまま呼び出します。
+        サブフォルダの走査は list_documents() の実装が担当するため、
+        新しいコードでは list_documents() を直接使用してください。
         
         Args:
             root_folder: ルートフォルダパス
         
         Returns:
-            全ドキュメント情報のリスト
+            list_documents(root_folder) の結果
         """
         return self.list_documents(root_folder)
+    
+    def set_known_documents(self, known_documents: Dict[str, dict]) -> None:
+        """
+        前回取り込み時のファイル情報を設定
+        
+        設定後の list_documents() は、更新日時が前回と同じファイルの
+        ダウンロードと解析を省略し、前回の content_hash をそのまま使います。
+        この場合の DocumentInfo は content が空文字列になるため、
+        差分検出（content_hash の比較）と組み合わせて使用してください。
+        
+        Args:
+            known_documents: DiffDetector.get_all_files() の結果
+                {file_id: {"content_hash": str, "modified_time": str, ...}}
+        """
+        self._known_documents = known_documents
+    
+    def _unchanged_content_hash(self, file_id: str, modified_time: datetime) -> Optional[str]:
+        """
+        更新日時が前回と同じファイルの content_hash を取得
+        
+        Args:
+            file_id: ファイルID
+            modified_time: 現在の更新日時
+        
+        取得に失敗した場合の空のハッシュは再利用しません（次回の取得で再試行するため）。
+        
+        Returns:
+            前回の content_hash（変更されている・比較できない場合はNone）
+        """
+        known = self._known_documents.get(file_id)
+        if not known or known.get("hash_algorithm") != DiffDetector.HASH_ALGORITHM:
+            return None
+        if known.get("modified_time") != modified_time.isoformat():
+            return None
+        content_hash = known.get("content_hash")
+        if not isinstance(content_hash, str) or not content_hash or content_hash == EMPTY_CONTENT_HASH:
+            return None
+        return content_hash
@@ -0,0 +1,166 @@
+"""
+docxテキスト抽出モジュール
+python-docx のオブジェクトツリーを構築せず、word/document.xml を
+ストリーミング解析して本文の段落テキストを取り出す
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, List, Optional, Union
+
+from lxml import etree
+
+
+# WordprocessingML の名前空間
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_BODY = _W + "body"
+_P = _W + "p"
+_R = _W + "r"
+_HYPERLINK = _W + "hyperlink"
+_BR = _W + "br"
+_TYPE = _W + "type"
+
+# これ以上のサイズのdocxはプロセスプールで解析（小さいファイルはプロセス間通信の方が高コスト）
+PROCESS_POOL_MIN_BYTES = 64 * 1024
+
+# ワーカーの起動方式（マルチスレッドのプロセスからの fork を避ける）
+_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# 解析用のプロセスプール（初回使用時に作成）
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+# ラン内の要素 → テキスト（python-docx の Run.text と同じ対応）
+_RUN_CHILD_TEXT: Dict[str, str] = {
+    _W + "tab": "\t",
+    _W + "ptab": "\t",
+    _W + "cr": "\n",
+    _W + "noBreakHyphen": "-",
+}
+
+
+def _run_text(run: etree._Element, parts: List[str]) -> None:
+    """ラン（w:r）のテキストを parts に追加"""
+    for child in run:
+        tag = child.tag
+        if tag == _W + "t":
+            if child.text:
+                parts.append(child.text)
+        elif tag == _BR:
+            # 改ページ・段区切りはテキストに含めない
+            if child.get(_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        else:
+            text = _RUN_CHILD_TEXT.get(tag)
+            if text:
+                parts.append(text)
+
+
+def _paragraph_text(paragraph: etree._Element) -> str:
+    """段落（w:p）直下のランとハイパーリンクからテキストを組み立てる"""
+    parts: List[str] = []
+    for child in paragraph:
+        if child.tag == _R:
+            _run_text(child, parts)
+        elif child.tag == _HYPERLINK:
+            for run in child.iterchildren(_R):
+                _run_text(run, parts)
+    return "".join(parts)
+
+
+def extract_docx_text(source: Union[BinaryIO, str]) -> str:
+    """
+    docxファイルから本文の段落テキストを抽出
+
+    python-docx の ``'\\n'.join(p.text for p in Document(source).paragraphs)`` と
+    同じ結果を返します（本文直下の段落のみ。表内の段落は含みません）。
+    処理済みの要素は逐次破棄するため、大きな文書でもメモリ使用量が増えません。
+
+    Args:
+        source: docxファイルのパスまたはバイナリストリーム
+
+    Returns:
+        段落ごとに改行で連結したテキスト
+    """
+    paragraphs: List[str] = []
+
+    with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as xml_file:
+        for _, element in etree.iterparse(xml_file, events=("end",), tag=_P):
+            parent = element.getparent()
+            if parent is not None and parent.tag == _BODY:
+                paragraphs.append(_paragraph_text(element))
+                element.clear()
+                # 処理済みの兄弟要素（段落・表）を解放
+                while element.getprevious() is not None:
+                    del parent[0]
+            # 表内などの入れ子の段落は親要素の処理時に破棄される
+
+    return "\n".join(paragraphs)
+
+
+def _extract_docx_text_bytes(data: bytes) -> str:
+    """バイト列からテキストを抽出（プロセスプールのワーカーで実行されるトップレベル関数）"""
+    return extract_docx_text(io.BytesIO(data))
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    """
+    解析用のプロセスプールを取得（未作成の場合は作成）
+    
+    ダウンロードスレッドの実行中に作成されるため、ロックを保持したスレッドごと
+    fork しないよう forkserver（使えない環境では spawn）でワーカーを起動します。
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context(_POOL_START_METHOD)
+            )
+        return _parse_pool
+
+
+def _discard_parse_pool(pool: ProcessPoolExecutor) -> None:
+    """壊れたプロセスプールを破棄（次回の使用時に作り直す）"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False)
+
+
+def extract_docx_text_from_bytes(data: bytes) -> str:
+    """
+    docxファイルのバイト列から本文の段落テキストを抽出
+    
+    大きなファイルはプロセスプールで解析するため、複数のダウンロードスレッドから
+    呼び出した場合でもGILに妨げられず複数コアで並列に解析されます。
+    プロセスプールが使えない環境では呼び出し元のスレッドで解析します。
+    
+    Args:
+        data: docxファイルのバイト列
+    
+    Returns:
+        段落ごとに改行で連結したテキスト
+    """
+    if len(data) < PROCESS_POOL_MIN_BYTES:
+        return _extract_docx_text_bytes(data)
+    
+    try:
+        pool = _get_parse_pool()
+        future = pool.submit(_extract_docx_text_bytes, data)
+    except (OSError, RuntimeError):
+        # プロセスを起動できない・終了処理中の場合
+        return _extract_docx_text_bytes(data)
+    
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _discard_parse_pool(pool)
+        return _extract_docx_text_bytes(data)
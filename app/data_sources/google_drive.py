@@ -4,29 +4,78 @@ Google Drive データソース実装
 
 import io
 import hashlib
-from typing import List, Optional
-from datetime import datetime
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
+import httplib2
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 
-from docx import Document as DocxDocument
-
-from .base import DataSourceBase, DocumentInfo
+from .base import ContentCache, DataSourceBase, DocumentInfo, EMPTY_CONTENT_HASH, parse_rfc3339
+from .docx_text import extract_docx_text_from_bytes
+from ..utils import fast_json
 from ..utils.logger import setup_logger
 
 
 # Google Drive APIのスコープ
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
+# フォルダ・対象ドキュメントのMIMEタイプ
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+GOOGLE_DOC_MIME_TYPE = 'application/vnd.google-apps.document'
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# 資格情報のプロセス内キャッシュ（(credentials_path, token_path) → Credentials）
+_credentials_cache: Dict[Tuple[str, str], Credentials] = {}
+_credentials_lock = threading.Lock()
+
+
+class HashingBytesIO(io.BytesIO):
+    """書き込みと同時にSHA256ハッシュを計算するBytesIO"""
+    
+    def __init__(self):
+        super().__init__()
+        self._hasher = hashlib.sha256()
+    
+    def write(self, data) -> int:
+        self._hasher.update(data)
+        return super().write(data)
+    
+    def hexdigest(self) -> str:
+        """これまでに書き込まれたバイト列のハッシュ"""
+        return self._hasher.hexdigest()
+
 
 class GoogleDriveDataSource(DataSourceBase):
     """Google Drive データソースクラス"""
     
+    # 同時に実行するダウンロード数（Driveのユーザー単位クォータを考慮）
+    MAX_CONCURRENT_DOWNLOADS = 8
+    
+    # ダウンロード済み内容のキャッシュ件数
+    CONTENT_CACHE_SIZE = 256
+    
+    # HTTP接続のタイムアウト（秒）
+    HTTP_TIMEOUT = 60
+    
+    # 一覧取得のクエリと取得フィールド（フォルダと対象ドキュメントをまとめて取得）
+    LIST_QUERY = (
+        "trashed=false and ("
+        "mimeType='" + FOLDER_MIME_TYPE + "' or "
+        "mimeType='" + GOOGLE_DOC_MIME_TYPE + "' or "
+        "mimeType='" + DOCX_MIME_TYPE + "')"
+    )
+    LIST_FIELDS = "nextPageToken, files(id, name, mimeType, modifiedTime, parents)"
+    
     def __init__(
         self,
         folder_id: str,
@@ -44,20 +93,36 @@ class GoogleDriveDataSource(DataSourceBase):
         self.folder_id = folder_id
         self.credentials_path = credentials_path
         self.token_path = token_path
-        self.service = None
+        self._creds: Optional[Credentials] = None
+        # 認証済みHTTP接続のプール（httplib2 はスレッドセーフではないため、
+        # 同時に1スレッドだけが使い、使用後はプールに戻して接続を再利用する）
+        self._http_pool: "queue.SimpleQueue[AuthorizedHttp]" = queue.SimpleQueue()
+        # (ファイルID, 更新日時) → (内容, ハッシュ)
+        self._content_cache = ContentCache(self.CONTENT_CACHE_SIZE)
         self.logger = setup_logger("GoogleDrive", log_path)
     
     def authenticate(self) -> bool:
-        """Google Drive APIの認証"""
+        """
+        Google Drive APIの認証
+        
+        資格情報はプロセス内でキャッシュし、有効な間は token.json を読み直しません。
+        token.json は新規認証またはリフレッシュで有効期限が更新された場合のみ書き込みます。
+        """
         try:
-            creds = None
+            cache_key = (str(self.credentials_path), str(self.token_path))
+            with _credentials_lock:
+                creds = _credentials_cache.get(cache_key)
             
-            # トークンが存在する場合は読み込む
-            if self.token_path.exists():
-                creds = Credentials.from_authorized_user_file(str(self.token_path), SCOPES)
+            # キャッシュがなくトークンが存在する場合は読み込む
+            if creds is None and self.token_path.exists():
+                creds = Credentials.from_authorized_user_info(
+                    fast_json.loads(self.token_path.read_bytes()), SCOPES
+                )
             
             # トークンが無効または存在しない場合は新規認証
             if not creds or not creds.valid:
+                previous_expiry = creds.expiry if creds else None
+                
                 if creds and creds.expired and creds.refresh_token:
                     creds.refresh(Request())
                 else:
@@ -70,12 +135,19 @@ class GoogleDriveDataSource(DataSourceBase):
                     )
                     creds = flow.run_local_server(port=0)
                 
-                # トークンを保存
-                with open(self.token_path, 'w') as token:
-                    token.write(creds.to_json())
+                # トークンを保存（有効期限が更新された場合のみ）
+                if creds.expiry != previous_expiry:
+                    self.token_path.write_text(creds.to_json())
+            
+            with _credentials_lock:
+                _credentials_cache[cache_key] = creds
             
-            # Drive APIサービスを構築
-            self.service = build('drive', 'v3', credentials=creds)
+            # Drive APIサービスを構築（ディスカバリーキャッシュのファイルI/Oは不要）
+            self._creds = creds
+            self._http_pool = queue.SimpleQueue()
+            self.service = build(
+                'drive', 'v3', http=self._new_http(), cache_discovery=False
+            )
             self.logger.info("Google Drive認証に成功しました")
             return True
             
@@ -83,157 +155,271 @@ class GoogleDriveDataSource(DataSourceBase):
             self.logger.error(f"Google Drive認証に失敗: {e}")
             return False
     
-    def _get_folders_in_folder(self, folder_id: str) -> List[dict]:
-        """フォルダ内のサブフォルダ一覧を取得"""
+    @cached_property
+    def service(self):
+        """
+        Drive APIサービス（未認証の場合は初回アクセス時に認証）
+        
+        authenticate() がインスタンス属性として設定するため、以降のアクセスは
+        通常の属性参照になります。
+        
+        Raises:
+            RuntimeError: 認証に失敗した場合
+        """
+        if not self.authenticate():
+            raise RuntimeError("Google Drive認証に失敗しました")
+        return self.__dict__['service']
+    
+    def _new_http(self) -> AuthorizedHttp:
+        """認証済みのHTTP接続を作成（接続はキープアライブで再利用される）"""
+        return AuthorizedHttp(self._creds, http=httplib2.Http(timeout=self.HTTP_TIMEOUT))
+    
+    @contextmanager
+    def _borrow_http(self) -> Iterator[AuthorizedHttp]:
+        """
+        プールからHTTP接続を借りる（空の場合は作成）
+        
+        ワーカースレッドごとに接続を作り直さず、確立済みのTLS接続を
+        list_documents() の呼び出しをまたいで再利用します。
+        """
         try:
-            query = f"'{folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                fields="files(id, name, modifiedTime)"
-            ).execute()
-            return results.get('files', [])
-        except Exception as e:
-            self.logger.error(f"フォルダ一覧取得エラー: {e}")
-            return []
+            http = self._http_pool.get_nowait()
+        except queue.Empty:
+            http = self._new_http()
+        try:
+            yield http
+        finally:
+            self._http_pool.put(http)
     
-    def _get_files_in_folder(self, folder_id: str) -> List[dict]:
-        """フォルダ内のファイル一覧を取得（Googleドキュメント）"""
+    def _list_all_descendants(self, root_id: str) -> List[Tuple[dict, str]]:
+        """
+        ルートフォルダ配下の対象ファイルをフォルダパス付きで列挙
+        
+        フォルダごとに問い合わせる代わりに、フォルダと対象ファイルを
+        ページ単位（最大1000件）でまとめて取得し、parents からツリーを再構築します。
+        
+        Args:
+            root_id: ルートフォルダID
+        
+        Returns:
+            (ファイル情報, フォルダパス) のリスト（フォルダ内のファイル → サブフォルダの順）
+        """
+        # 親フォルダID → 子アイテムのリスト
+        children: Dict[str, List[dict]] = {}
+        page_token = None
         try:
-            # Google Docsのみを取得
-            query = f"'{folder_id}' in parents and (mimeType='application/vnd.google-apps.document' or mimeType='application/vnd.openxmlformats-officedocument.wordprocessingml.document') and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                fields="files(id, name, modifiedTime, mimeType)"
-            ).execute()
-            return results.get('files', [])
+            while True:
+                results = self.service.files().list(
+                    q=self.LIST_QUERY,
+                    pageSize=1000,
+                    pageToken=page_token,
+                    fields=self.LIST_FIELDS
+                ).execute()
+                
+                for item in results.get('files', []):
+                    for parent_id in item.get('parents', []):
+                        children.setdefault(parent_id, []).append(item)
+                
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
         except Exception as e:
             self.logger.error(f"ファイル一覧取得エラー: {e}")
             return []
+        
+        # ルートから深さ優先でたどり、フォルダパスを組み立てる（API呼び出しなし）
+        files: List[Tuple[dict, str]] = []
+        visited = {root_id}
+        stack = [(root_id, "")]
+        while stack:
+            folder_id, current_path = stack.pop()
+            subfolders = []
+            for item in children.get(folder_id, []):
+                if item.get('mimeType') == FOLDER_MIME_TYPE:
+                    subfolders.append(item)
+                else:
+                    files.append((item, current_path))
+            
+            # 元の順序で処理されるよう逆順に積む
+            for subfolder in reversed(subfolders):
+                if subfolder['id'] in visited:
+                    continue
+                visited.add(subfolder['id'])
+                subfolder_path = f"{current_path}/{subfolder['name']}" if current_path else subfolder['name']
+                stack.append((subfolder['id'], subfolder_path))
+        
+        return files
     
     def list_documents(self, folder_path: Optional[str] = None) -> List[DocumentInfo]:
         """ドキュメント一覧を取得（再帰的に全フォルダを探索）"""
-        if not self.service:
-            self.authenticate()
-        
-        documents = []
+        # ルートフォルダ配下の対象ファイルを一括で列挙
+        files = self._list_all_descendants(self.folder_id)
         
-        # ルートフォルダから再帰的に探索
-        self._list_documents_recursive(self.folder_id, "", documents)
+        # 内容のダウンロードは並列に実行（順序は列挙順を維持）
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_DOWNLOADS) as executor:
+            results = executor.map(lambda item: self._build_document_info(*item), files)
+            documents = [doc_info for doc_info in results if doc_info is not None]
         
         self.logger.info(f"合計 {len(documents)} 件のドキュメントを取得しました")
         return documents
     
-    def _list_documents_recursive(
-        self,
-        folder_id: str,
-        current_path: str,
-        documents: List[DocumentInfo]
-    ):
-        """再帰的にドキュメントを取得"""
-        # 現在のフォルダ内のファイルを取得
-        files = self._get_files_in_folder(folder_id)
-        
-        for file in files:
-            try:
-                content = self.get_document_content(file['id'])
-                content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
-                
-                modified_time = datetime.fromisoformat(
-                    file['modifiedTime'].replace('Z', '+00:00')
-                )
-                
-                doc_info = DocumentInfo(
-                    file_id=file['id'],
-                    name=file['name'],
-                    content=content,
-                    modified_time=modified_time,
-                    folder_path=current_path,
-                    content_hash=content_hash,
-                    metadata={
-                        'mimeType': file.get('mimeType', ''),
-                        'data_source': 'google_drive',
-                        'file_url': f"https://drive.google.com/file/d/{file['id']}/view"
-                    }
-                )
-                documents.append(doc_info)
-                self.logger.info(f"取得: {current_path}/{file['name']}")
-                
-            except Exception as e:
-                self.logger.error(f"ファイル取得エラー ({file['name']}): {e}")
+    def _build_document_info(self, file: dict, current_path: str) -> Optional[DocumentInfo]:
+        """
+        ファイルの内容を取得して DocumentInfo を生成（ワーカースレッドから呼ばれる）
         
-        # サブフォルダを再帰的に探索
-        subfolders = self._get_folders_in_folder(folder_id)
-        for subfolder in subfolders:
-            subfolder_path = f"{current_path}/{subfolder['name']}" if current_path else subfolder['name']
-            self._list_documents_recursive(subfolder['id'], subfolder_path, documents)
-    
-    def get_document_content(self, file_id: str) -> str:
-        """ドキュメントの内容を取得"""
-        if not self.service:
-            self.authenticate()
+        Args:
+            file: files.list で取得したファイル情報
+            current_path: フォルダパス
         
+        Returns:
+            ドキュメント情報（取得に失敗した場合はNone）
+        """
         try:
-            # ファイル情報を取得
-            file_metadata = self.service.files().get(fileId=file_id, fields='mimeType').execute()
-            mime_type = file_metadata.get('mimeType')
+            modified_time = parse_rfc3339(file['modifiedTime'])
             
-            # Google Docsの場合
-            if mime_type == 'application/vnd.google-apps.document':
-                # テキスト形式でエクスポート
-                request = self.service.files().export_media(
-                    fileId=file_id,
-                    mimeType='text/plain'
+            # 前回から更新されていなければダウンロードを省略
+            known_hash = self._unchanged_content_hash(file['id'], modified_time)
+            if known_hash is not None:
+                content, content_hash = "", known_hash
+            else:
+                content, content_hash = self._download_document(
+                    file['id'], file.get('mimeType'), file.get('modifiedTime')
                 )
-                file_content = io.BytesIO()
-                downloader = MediaIoBaseDownload(file_content, request)
-                
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                
-                return file_content.getvalue().decode('utf-8')
             
-            # Word文書の場合
-            elif mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-                request = self.service.files().get_media(fileId=file_id)
-                file_content = io.BytesIO()
-                downloader = MediaIoBaseDownload(file_content, request)
-                
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                
-                # python-docxで読み込み
-                file_content.seek(0)
-                doc = DocxDocument(file_content)
-                return '\n'.join([para.text for para in doc.paragraphs])
+            doc_info = DocumentInfo(
+                file_id=file['id'],
+                name=file['name'],
+                content=content,
+                modified_time=modified_time,
+                folder_path=current_path,
+                content_hash=content_hash,
+                metadata={
+                    'mimeType': file.get('mimeType', ''),
+                    'data_source': 'google_drive',
+                    'file_url': f"https://drive.google.com/file/d/{file['id']}/view"
+                }
+            )
+            if known_hash is None:
+                self.logger.info(f"取得: {current_path}/{file['name']}")
+            return doc_info
             
-            else:
-                self.logger.warning(f"未対応のファイル形式: {mime_type}")
-                return ""
-                
+        except Exception as e:
+            self.logger.error(f"ファイル取得エラー ({file['name']}): {e}")
+            return None
+    
+    def get_document_content(self, file_id: str, mime_type: Optional[str] = None) -> str:
+        """
+        ドキュメントの内容を取得
+        
+        Args:
+            file_id: ファイルID
+            mime_type: MIMEタイプ（一覧取得で既知の場合に渡すとメタデータ取得を省略）
+        
+        Returns:
+            ドキュメントの内容
+        """
+        content, _ = self._download_document(file_id, mime_type)
+        return content
+    
+    def _download_document(
+        self,
+        file_id: str,
+        mime_type: Optional[str] = None,
+        modified_time: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        ドキュメントをダウンロードし、内容とハッシュを取得
+        
+        ハッシュはダウンロードしたバイト列に対してダウンロードと同時に計算します。
+        Googleドキュメント（text/plainエクスポート）では内容のUTF-8表現と一致し、
+        Word文書ではdocxファイル自体のハッシュになります。
+        更新日時が分かる場合は (ファイルID, 更新日時) をキーに結果をキャッシュします。
+        
+        Args:
+            file_id: ファイルID
+            mime_type: MIMEタイプ（一覧取得で既知の場合に渡すとメタデータ取得を省略）
+            modified_time: 更新日時（APIが返す文字列。キャッシュキーに使用）
+        
+        Returns:
+            (ドキュメントの内容, SHA256ハッシュ)。取得できない場合は内容が空文字列
+        """
+        cache_key = (file_id, modified_time) if modified_time else None
+        if cache_key is not None:
+            cached = self._content_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        result = self._fetch_document(file_id, mime_type)
+        
+        # 取得に失敗した結果はキャッシュしない
+        if cache_key is not None and result[1] != EMPTY_CONTENT_HASH:
+            self._content_cache.put(cache_key, result)
+        return result
+    
+    def _fetch_document(self, file_id: str, mime_type: Optional[str]) -> Tuple[str, str]:
+        """ドキュメントをダウンロードし、内容とハッシュを取得（キャッシュなし）"""
+        try:
+            # 先にサービスを取得（未認証の場合はここで認証される）
+            files = self.service.files()
+            with self._borrow_http() as http:
+                return self._fetch_document_with(files, http, file_id, mime_type)
         except Exception as e:
             self.logger.error(f"ドキュメント内容取得エラー: {e}")
-            return ""
+        
+        return "", EMPTY_CONTENT_HASH
+    
+    def _fetch_document_with(
+        self,
+        files,
+        http: AuthorizedHttp,
+        file_id: str,
+        mime_type: Optional[str]
+    ) -> Tuple[str, str]:
+        """借りたHTTP接続でドキュメントをダウンロードし、内容とハッシュを取得"""
+        # MIMEタイプが不明な場合のみファイル情報を取得
+        if mime_type is None:
+            file_metadata = files.get(fileId=file_id, fields='mimeType').execute(http=http)
+            mime_type = file_metadata.get('mimeType')
+        
+        # Google Docsの場合（テキスト形式でエクスポート）
+        if mime_type == GOOGLE_DOC_MIME_TYPE:
+            request = files.export_media(fileId=file_id, mimeType='text/plain')
+        # Word文書の場合
+        elif mime_type == DOCX_MIME_TYPE:
+            request = files.get_media(fileId=file_id)
+        else:
+            self.logger.warning(f"未対応のファイル形式: {mime_type}")
+            return "", EMPTY_CONTENT_HASH
+        
+        # MediaIoBaseDownload はリクエストの http を使ってダウンロードする
+        request.http = http
+        file_content = HashingBytesIO()
+        downloader = MediaIoBaseDownload(file_content, request)
+        
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
+        
+        if mime_type == GOOGLE_DOC_MIME_TYPE:
+            return file_content.getvalue().decode('utf-8'), file_content.hexdigest()
+        
+        # 本文テキストを抽出
+        return extract_docx_text_from_bytes(file_content.getvalue()), file_content.hexdigest()
     
     def get_document_info(self, file_id: str) -> Optional[DocumentInfo]:
         """ドキュメント情報を取得"""
-        if not self.service:
-            self.authenticate()
-        
         try:
             file = self.service.files().get(
                 fileId=file_id,
                 fields='id, name, modifiedTime, mimeType'
             ).execute()
             
-            content = self.get_document_content(file_id)
-            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
-            
-            modified_time = datetime.fromisoformat(
-                file['modifiedTime'].replace('Z', '+00:00')
+            content, content_hash = self._download_document(
+                file_id, file.get('mimeType'), file.get('modifiedTime')
             )
             
+            modified_time = parse_rfc3339(file['modifiedTime'])
+            
             return DocumentInfo(
                 file_id=file['id'],
                 name=file['name'],
@@ -2,25 +2,33 @@
 SharePoint データソース実装
 """
 
-import io
 import hashlib
-from typing import List, Optional
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import List, Optional, Tuple
 from pathlib import Path
 
 from office365.runtime.auth.client_credential import ClientCredential
 from office365.sharepoint.client_context import ClientContext
 from office365.sharepoint.files.file import File
 
-from docx import Document as DocxDocument
-
-from .base import DataSourceBase, DocumentInfo
+from .base import ContentCache, DataSourceBase, DocumentInfo, EMPTY_CONTENT_HASH, parse_rfc3339
+from .docx_text import extract_docx_text_from_bytes
 from ..utils.logger import setup_logger
 
 
 class SharePointDataSource(DataSourceBase):
     """SharePoint データソースクラス"""
     
+    # 同時に実行するダウンロード数
+    MAX_CONCURRENT_DOWNLOADS = 16
+    
+    # 一覧取得時に読み込むファイルのプロパティ（ファイルごとの追加問い合わせを避ける）
+    FILE_PROPERTIES = ['Name', 'TimeLastModified', 'UniqueId', 'ServerRelativeUrl', 'Length']
+    
+    # ダウンロード済み内容のキャッシュ件数
+    CONTENT_CACHE_SIZE = 256
+    
     def __init__(
         self,
         site_url: str,
@@ -44,19 +52,21 @@ class SharePointDataSource(DataSourceBase):
         self.client_id = client_id
         self.client_secret = client_secret
         self.tenant_id = tenant_id
-        self.ctx = None
+        # (UniqueId, 更新日時) → (内容, ハッシュ)
+        self._content_cache = ContentCache(self.CONTENT_CACHE_SIZE)
         self.logger = setup_logger("SharePoint", log_path)
     
     def authenticate(self) -> bool:
         """SharePoint認証"""
         try:
             credentials = ClientCredential(self.client_id, self.client_secret)
-            self.ctx = ClientContext(self.site_url).with_credentials(credentials)
+            ctx = ClientContext(self.site_url).with_credentials(credentials)
             
-            # 接続テスト
-            web = self.ctx.web
-            self.ctx.load(web)
-            self.ctx.execute_query()
+            # 接続テスト（成功した場合のみコンテキストを保持）
+            web = ctx.web
+            ctx.load(web)
+            ctx.execute_query()
+            self.ctx = ctx
             
             self.logger.info(f"SharePoint認証に成功: {web.properties['Title']}")
             return True
@@ -65,60 +75,41 @@ class SharePointDataSource(DataSourceBase):
             self.logger.error(f"SharePoint認証に失敗: {e}")
             return False
     
+    @cached_property
+    def ctx(self) -> ClientContext:
+        """
+        SharePointクライアントコンテキスト（未認証の場合は初回アクセス時に認証）
+        
+        authenticate() がインスタンス属性として設定するため、以降のアクセスは
+        通常の属性参照になります。
+        
+        Raises:
+            RuntimeError: 認証に失敗した場合
+        """
+        if not self.authenticate():
+            raise RuntimeError("SharePoint認証に失敗しました")
+        return self.__dict__['ctx']
+    
     def _get_folder_items_recursive(
         self,
         folder_url: str,
         current_path: str,
-        documents: List[DocumentInfo]
+        files: List[Tuple[File, str]]
     ):
-        """フォルダ内のアイテムを再帰的に取得"""
+        """フォルダ内の対象ファイルを再帰的に列挙（(ファイル, フォルダパス) を追加）"""
         try:
             # フォルダを取得
             folder = self.ctx.web.get_folder_by_server_relative_url(folder_url)
             
-            # ファイル一覧を取得
-            files = folder.files
-            self.ctx.load(files)
+            # ファイル一覧を取得（以降の処理で必要なプロパティもまとめて取得）
+            folder_files = folder.files
+            self.ctx.load(folder_files, self.FILE_PROPERTIES)
             self.ctx.execute_query()
             
-            for file in files:
+            for file in folder_files:
                 # Word文書のみを対象
                 if file.name.endswith(('.docx', '.doc')):
-                    try:
-                        content = self._get_file_content(file)
-                        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
-                        
-                        # 修正日時を取得
-                        self.ctx.load(file, ['TimeLastModified'])
-                        self.ctx.execute_query()
-                        
-                        modified_time = file.properties.get('TimeLastModified')
-                        if isinstance(modified_time, str):
-                            modified_time = datetime.fromisoformat(modified_time.replace('Z', '+00:00'))
-                        
-                        # SharePointファイルのWebURLを構築
-                        server_relative_url = file.properties.get('ServerRelativeUrl', '')
-                        file_url = f"{self.site_url}/_layouts/15/Doc.aspx?sourcedoc={{{file.properties['UniqueId']}}}&action=default"
-                        
-                        doc_info = DocumentInfo(
-                            file_id=file.properties['UniqueId'],
-                            name=file.name,
-                            content=content,
-                            modified_time=modified_time,
-                            folder_path=current_path,
-                            content_hash=content_hash,
-                            metadata={
-                                'server_relative_url': server_relative_url,
-                                'size': file.properties.get('Length', 0),
-                                'data_source': 'sharepoint',
-                                'file_url': file_url
-                            }
-                        )
-                        documents.append(doc_info)
-                        self.logger.info(f"取得: {current_path}/{file.name}")
-                        
-                    except Exception as e:
-                        self.logger.error(f"ファイル取得エラー ({file.name}): {e}")
+                    files.append((file, current_path))
             
             # サブフォルダを取得
             subfolders = folder.folders
@@ -132,49 +123,120 @@ class SharePointDataSource(DataSourceBase):
                 
                 subfolder_path = f"{current_path}/{subfolder.name}" if current_path else subfolder.name
                 subfolder_url = subfolder.properties['ServerRelativeUrl']
-                self._get_folder_items_recursive(subfolder_url, subfolder_path, documents)
+                self._get_folder_items_recursive(subfolder_url, subfolder_path, files)
                 
         except Exception as e:
             self.logger.error(f"フォルダ取得エラー ({folder_url}): {e}")
     
+    def _fetch_one(self, file: File, current_path: str) -> Optional[DocumentInfo]:
+        """
+        ファイルをダウンロードして DocumentInfo を生成（ワーカースレッドから呼ばれる）
+        
+        Args:
+            file: プロパティ読み込み済みのファイル
+            current_path: フォルダパス
+        
+        Returns:
+            ドキュメント情報（取得に失敗した場合はNone）
+        """
+        try:
+            # 修正日時（一覧取得時に読み込み済み）
+            modified_time = file.properties.get('TimeLastModified')
+            if isinstance(modified_time, str):
+                modified_time = parse_rfc3339(modified_time)
+            
+            # 前回から更新されていなければダウンロードを省略
+            known_hash = self._unchanged_content_hash(file.properties['UniqueId'], modified_time)
+            if known_hash is not None:
+                content, content_hash = "", known_hash
+            else:
+                content, content_hash = self._download_file(file)
+            
+            # SharePointファイルのWebURLを構築
+            server_relative_url = file.properties.get('ServerRelativeUrl', '')
+            file_url = f"{self.site_url}/_layouts/15/Doc.aspx?sourcedoc={{{file.properties['UniqueId']}}}&action=default"
+            
+            doc_info = DocumentInfo(
+                file_id=file.properties['UniqueId'],
+                name=file.name,
+                content=content,
+                modified_time=modified_time,
+                folder_path=current_path,
+                content_hash=content_hash,
+                metadata={
+                    'server_relative_url': server_relative_url,
+                    'size': file.properties.get('Length', 0),
+                    'data_source': 'sharepoint',
+                    'file_url': file_url
+                }
+            )
+            if known_hash is None:
+                self.logger.info(f"取得: {current_path}/{file.name}")
+            return doc_info
+            
+        except Exception as e:
+            self.logger.error(f"ファイル取得エラー ({file.name}): {e}")
+            return None
+    
     def _get_file_content(self, file: File) -> str:
         """ファイル内容を取得"""
+        content, _ = self._download_file(file)
+        return content
+    
+    def _download_file(self, file: File) -> Tuple[str, str]:
+        """
+        ファイルをダウンロードし、内容とハッシュを取得
+        
+        ハッシュはダウンロードしたdocxファイルのバイト列に対して計算します
+        （テキストを再エンコードしてハッシュ化する必要がありません）。
+        結果は (UniqueId, 更新日時) をキーにキャッシュします。
+        
+        Returns:
+            (ファイル内容, SHA256ハッシュ)。取得できない場合は内容が空文字列
+        """
+        unique_id = file.properties.get('UniqueId')
+        modified_time = file.properties.get('TimeLastModified')
+        cache_key = (unique_id, str(modified_time)) if unique_id and modified_time else None
+        if cache_key is not None:
+            cached = self._content_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
             # ファイルをダウンロード
             response = File.open_binary(self.ctx, file.properties['ServerRelativeUrl'])
+            raw_content = response.content
             
-            # BytesIOに変換
-            file_content = io.BytesIO(response.content)
-            
-            # python-docxで読み込み
-            doc = DocxDocument(file_content)
-            return '\n'.join([para.text for para in doc.paragraphs])
+            # 本文テキストを抽出
+            content = extract_docx_text_from_bytes(raw_content)
+            result = (content, hashlib.sha256(raw_content).hexdigest())
+            if cache_key is not None:
+                self._content_cache.put(cache_key, result)
+            return result
             
         except Exception as e:
             self.logger.error(f"ファイル内容取得エラー: {e}")
-            return ""
+            return "", EMPTY_CONTENT_HASH
     
     def list_documents(self, folder_path: Optional[str] = None) -> List[DocumentInfo]:
         """ドキュメント一覧を取得"""
-        if not self.ctx:
-            self.authenticate()
-        
-        documents = []
-        
         # フォルダパスの構築
         target_folder = folder_path if folder_path else self.folder_path
         
-        # 再帰的に取得
-        self._get_folder_items_recursive(target_folder, "", documents)
+        # 再帰的に対象ファイルを列挙（クエリキューを共有するため逐次実行）
+        files: List[Tuple[File, str]] = []
+        self._get_folder_items_recursive(target_folder, "", files)
+        
+        # ダウンロードと解析は並列に実行（順序は列挙順を維持）
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_DOWNLOADS) as executor:
+            results = executor.map(lambda item: self._fetch_one(*item), files)
+            documents = [doc_info for doc_info in results if doc_info is not None]
         
         self.logger.info(f"合計 {len(documents)} 件のドキュメントを取得しました")
         return documents
     
     def get_document_content(self, file_id: str) -> str:
         """ドキュメントの内容を取得（file_idはServerRelativeUrl）"""
-        if not self.ctx:
-            self.authenticate()
-        
         try:
             file = self.ctx.web.get_file_by_server_relative_url(file_id)
             self.ctx.load(file)
@@ -188,20 +250,16 @@ class SharePointDataSource(DataSourceBase):
     
     def get_document_info(self, file_id: str) -> Optional[DocumentInfo]:
         """ドキュメント情報を取得"""
-        if not self.ctx:
-            self.authenticate()
-        
         try:
             file = self.ctx.web.get_file_by_server_relative_url(file_id)
-            self.ctx.load(file, ['Name', 'TimeLastModified', 'UniqueId', 'ServerRelativeUrl', 'Length'])
+            self.ctx.load(file, self.FILE_PROPERTIES)
             self.ctx.execute_query()
             
-            content = self._get_file_content(file)
-            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+            content, content_hash = self._download_file(file)
             
             modified_time = file.properties.get('TimeLastModified')
             if isinstance(modified_time, str):
-                modified_time = datetime.fromisoformat(modified_time.replace('Z', '+00:00'))
+                modified_time = parse_rfc3339(modified_time)
             
             return DocumentInfo(
                 file_id=file.properties['UniqueId'],
@@ -4,6 +4,7 @@
 
 import streamlit as st
 from pathlib import Path
+from typing import Callable, List, Optional
 import sys
 
 # プロジェクトルートをパスに追加
@@ -13,6 +14,7 @@ sys.path.insert(0, str(project_root))
 from app.config import get_settings
 from app.vector_store import VectorStoreManager
 from app.rag import RAGChatEngine
+from app.utils import DiffDetector
 
 
 # ページ設定
@@ -41,6 +43,7 @@ def initialize_system(_cache_version: str = "v1.1"):
             metadata_path=settings.metadata_path,
             openai_api_key=settings.openai_api_key,
             embedding_model=settings.embedding_model,
+            embedding_dimensions=settings.embedding_dimensions,
             chunk_size=settings.chunk_size,
             chunk_overlap=settings.chunk_overlap,
             log_path=settings.log_path
@@ -62,6 +65,126 @@ def initialize_system(_cache_version: str = "v1.1"):
         st.stop()
 
 
+def _metadata_mtime(metadata_path: Path) -> float:
+    """
+    ファイルメタデータの最終更新時刻を取得（ドキュメント数キャッシュのキー）
+    
+    ドキュメント数はファイルメタデータ（file_metadata.json）から数えるため、その更新時刻を使う
+    """
+    try:
+        return (metadata_path / "file_metadata.json").stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_cached_document_count(path_mtime: float, manager_id: int, _vector_store_manager) -> int:
+    """
+    登録ドキュメント数を取得（キャッシュ）
+    
+    再実行のたびにメタデータを読み直さないよう、ファイルメタデータの更新時刻と
+    マネージャーのIDをキーにキャッシュします（ドキュメント登録で更新時刻が変わると再取得）。
+    
+    Args:
+        path_mtime: ファイルメタデータの更新時刻（キャッシュキー）
+        manager_id: マネージャーのID（キャッシュキー）
+        _vector_store_manager: ベクターストアマネージャー（ハッシュ対象外）
+    
+    Returns:
+        登録ドキュメント数
+    """
+    vector_store_manager = _vector_store_manager
+    
+    # メソッドの存在を確認（Streamlit Cloudのキャッシュ問題に対応）
+    if hasattr(vector_store_manager, 'get_document_count'):
+        return vector_store_manager.get_document_count()
+    
+    # フォールバック: 取り込み時に保存されるファイル単位のメタデータから件数を取得
+    # （ChromaDBの全チャンクのメタデータを走査しない）
+    doc_count = 0
+    try:
+        doc_count = len(DiffDetector(vector_store_manager.metadata_path).get_all_files())
+    except Exception as e:
+        doc_count = 0
+        # デバッグ情報（開発環境のみ）
+        import os
+        if os.getenv("DEBUG", "false").lower() == "true":
+            st.exception(e)
+    
+    return doc_count
+
+
+def generate_response(
+    chat_engine,
+    prompt: str,
+    on_token: Optional[Callable[[str], None]] = None
+) -> dict:
+    """
+    回答をストリーミングで生成
+    
+    生成された断片ごとに on_token を呼び出します。
+    回答のキャッシュはチャットエンジン側（質問と検索結果をキーにしたキャッシュ）で行います。
+    
+    Args:
+        chat_engine: RAGチャットエンジン
+        prompt: ユーザーの質問
+        on_token: 回答の断片を受け取るコールバック
+    
+    Returns:
+        chat_engine.chat() の結果
+    """
+    response: dict = {}
+    for item in chat_engine.chat_stream(prompt):
+        if isinstance(item, dict):
+            response = item
+        elif on_token is not None:
+            on_token(item)
+    return response
+
+
+def _source_header(index: int, source: dict) -> str:
+    """
+    ソースの見出し（タイトル・リンク・スコア）のMarkdownを取得
+    
+    一度組み立てた文字列は source["_rendered_header"] に保持し、
+    再実行時の履歴表示では組み立て直さずに再利用します。
+    """
+    header = source.get("_rendered_header")
+    if header is None:
+        folder = source.get("folder_path", "")
+        name = source.get("name", "不明")
+        path = f"{folder}/{name}" if folder else name
+        file_url = source.get("file_url", "")
+        relevance = source.get("relevance_score", 0)
+        distance = source.get("distance", 0)
+        
+        # タイトルとリンク（距離スコアも表示）
+        title = f"[{path}]({file_url})" if file_url else path
+        header = f"**{index}. {title}** (関連度: {relevance:.1%}, 距離: {distance:.3f})"
+        source["_rendered_header"] = header
+    return header
+
+
+def _render_sources(sources: list) -> None:
+    """
+    参照した議事メモの一覧を表示
+    
+    Args:
+        sources: ソース情報のリスト
+    """
+    with st.expander(f"📄 参照した議事メモ（{len(sources)}件）"):
+        for i, source in enumerate(sources, 1):
+            st.markdown(_source_header(i, source))
+            
+            # 全文表示（入力ウィジェットではなく表示専用の要素を使用）
+            content = source.get("content", "")
+            if content:
+                st.code(content, language=None)
+            
+            if i < len(sources):
+                st.markdown("---")
+
+
 def main():
     """メインアプリケーション"""
     
@@ -75,35 +198,15 @@ def main():
     
     # サイドバー
     with st.sidebar:
-        # 登録ドキュメント数（ベクターストアから直接取得）
+        # 登録ドキュメント数（ファイルメタデータの更新時刻をキーにキャッシュ）
         try:
             # ベクターストアマネージャーを取得
             vector_store_manager = chat_engine.vector_store_manager
-            
-            # メソッドの存在を確認（Streamlit Cloudのキャッシュ問題に対応）
-            if hasattr(vector_store_manager, 'get_document_count'):
-                doc_count = vector_store_manager.get_document_count()
-            else:
-                # フォールバック: ChromaDBから直接取得を試みる
-                doc_count = 0
-                try:
-                    if vector_store_manager.vector_store is not None:
-                        results = vector_store_manager.vector_store.get()
-                        if results and "metadatas" in results:
-                            metadatas = results["metadatas"]
-                            if metadatas:
-                                unique_file_ids = set()
-                                for metadata in metadatas:
-                                    if metadata and "file_id" in metadata:
-                                        unique_file_ids.add(metadata["file_id"])
-                                doc_count = len(unique_file_ids)
-                except Exception as e:
-                    doc_count = 0
-                    # デバッグ情報（開発環境のみ）
-                    import os
-                    if os.getenv("DEBUG", "false").lower() == "true":
-                        st.exception(e)
-                    
+            doc_count = get_cached_document_count(
+                _metadata_mtime(settings.metadata_path),
+                id(vector_store_manager),
+                vector_store_manager
+            )
         except Exception as e:
             # エラーが発生した場合は0を表示
             doc_count = 0
@@ -170,36 +273,7 @@ def main():
                 )
                 
                 if not should_hide and message["sources"]:
-                    with st.expander(f"📄 参照した議事メモ（{len(message['sources'])}件）"):
-                        for i, source in enumerate(message["sources"], 1):
-                            folder = source.get("folder_path", "")
-                            name = source.get("name", "不明")
-                            path = f"{folder}/{name}" if folder else name
-                            file_url = source.get("file_url", "")
-                            relevance = source.get("relevance_score", 0)
-                            
-                            # タイトルとリンク（距離スコアも表示）
-                            distance = source.get("distance", 0)
-                            if file_url:
-                                st.markdown(f"**{i}. [{path}]({file_url})** (関連度: {relevance:.1%}, 距離: {distance:.3f})")
-                            else:
-                                st.markdown(f"**{i}. {path}** (関連度: {relevance:.1%}, 距離: {distance:.3f})")
-                            
-                            # 全文表示
-                            content = source.get("content", "")
-                            if content:
-                                # ユニークなキーを生成（メッセージインデックス + ソースインデックス）
-                                st.text_area(
-                                    f"内容_{i}",
-                                    content,
-                                    height=200,
-                                    disabled=True,
-                                    label_visibility="collapsed",
-                                    key=f"hist_{msg_idx}_src_{i}"
-                                )
-                            
-                            if i < len(message["sources"]):
-                                st.markdown("---")
+                    _render_sources(message["sources"])
     
     # ユーザー入力
     if prompt := st.chat_input("議事メモについて質問してください..."):
@@ -213,46 +287,24 @@ def main():
         # アシスタントの応答
         with st.chat_message("assistant"):
             with st.spinner("考え中..."):
-                # RAGエンジンで回答を生成
-                response = chat_engine.chat(prompt)
+                # RAGエンジンで回答を生成（生成中の回答を順次表示）
+                answer_placeholder = st.empty()
+                streamed: List[str] = []
+                
+                def show_token(token: str):
+                    streamed.append(token)
+                    answer_placeholder.markdown("".join(streamed) + "▌")
+                
+                response = generate_response(chat_engine, prompt, on_token=show_token)
                 answer = response["answer"]
                 sources = response["sources"]
                 
                 # 回答を表示
-                st.markdown(answer)
+                answer_placeholder.markdown(answer)
                 
                 # ソース情報を表示
                 if sources:
-                    with st.expander(f"📄 参照した議事メモ（{len(sources)}件）"):
-                        for i, source in enumerate(sources, 1):
-                            folder = source.get("folder_path", "")
-                            name = source.get("name", "不明")
-                            path = f"{folder}/{name}" if folder else name
-                            file_url = source.get("file_url", "")
-                            relevance = source.get("relevance_score", 0)
-                            
-                            # タイトルとリンク（距離スコアも表示）
-                            distance = source.get("distance", 0)
-                            if file_url:
-                                st.markdown(f"**{i}. [{path}]({file_url})** (関連度: {relevance:.1%}, 距離: {distance:.3f})")
-                            else:
-                                st.markdown(f"**{i}. {path}** (関連度: {relevance:.1%}, 距離: {distance:.3f})")
-                            
-                            # 全文表示
-                            content = source.get("content", "")
-                            if content:
-                                # 新しい回答用のユニークなキー（"new"プレフィックス）
-                                st.text_area(
-                                    f"内容_{i}",
-                                    content,
-                                    height=200,
-                                    disabled=True,
-                                    label_visibility="collapsed",
-                                    key=f"new_src_{i}"
-                                )
-                            
-                            if i < len(sources):
-                                st.markdown("---")
+                    _render_sources(sources)
                 else:
                     st.info("関連する議事メモが見つかりませんでした。")
         
@@ -3,20 +3,39 @@ RAGチャットエンジン
 ベクターストアを使用した質問応答システム
 """
 
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Optional
-import os
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import asyncio
+import hashlib
+import itertools
+import re
+import threading
 
-from langchain_classic.chains import ConversationalRetrievalChain
-from langchain_classic.memory import ConversationBufferMemory
+import openai
+
+from langchain_classic.memory import ConversationBufferWindowMemory
 from langchain_openai import ChatOpenAI
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.prompts import PromptTemplate
+from tenacity import (
+    RetryCallState,
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
 from ..vector_store.manager import VectorStoreManager
+from .semantic_cache import SemanticCache
 from ..utils.logger import setup_logger
 
 
-# システムプロンプト
+# システムプロンプト（常に先頭のメッセージとして同一の内容で送信し、
+# OpenAIのプロンプトキャッシュが先頭部分に適用されるようにする）
 SYSTEM_PROMPT = """あなたは議事メモを管理するアシスタントです。
 以下の議事メモの内容に基づいて、ユーザーの質問に正確に答えてください。
 
@@ -32,6 +51,9 @@ SYSTEM_PROMPT = """あなたは議事メモを管理するアシスタントで
 - 日付や数値などの具体的な情報は正確に引用してください
 """
 
+# 関連する議事メモが見つからなかった場合の回答
+NO_RESULT_ANSWER = "申し訳ございません。質問に関連する議事メモが見つかりませんでした。"
+
 QA_PROMPT_TEMPLATE = """
 以下の議事メモの情報を参考にして、質問に答えてください。
 
@@ -45,9 +67,117 @@ QA_PROMPT_TEMPLATE = """
 """
 
 
+# 質問に含まれる数値（金額・回数・日付など）
+_QUESTION_NUMBER_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:万円|円|回|年|月|日)')
+
+# ドキュメント内容に含まれる数値（金額・日付など）
+_DOC_NUMBER_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:万円|円|年|月|日)')
+
+# 最新の議事メモを求める質問のキーワード
+_LATEST_KEYWORD_RE = re.compile(r'最新|最後|直近|現在')
+
+# 会議の回数を指定する質問のキーワード（「回目の」は「回目」に含まれる）
+_MEETING_QUERY_RE = re.compile(r'回目|回の')
+
+# ファイル名の「第〇回」
+_MEETING_NUMBER_RE = re.compile(r'第(\d+)回')
+
+# ■日時: YYYY/MM/DD HH:MM
+_MEETING_DATE_RE = re.compile(r'■日時[：:]\s*(\d{4})[//-](\d{1,2})[//-](\d{1,2})')
+
+# 一般的な会社名パターン
+_COMPANY_RES = (
+    re.compile(r'([\w\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]+(?:株式会社|インダストリー|商事|ソリューションズ|フロンティア))'),
+    re.compile(r'([A-Z][a-z]+)'),  # 英語の会社名
+)
+
+
+@lru_cache(maxsize=1024)
+def _extract_meeting_date(doc_content: str) -> datetime:
+    """
+    ドキュメント内容から開催日時を抽出（見つからない場合は最古の日付）
+    
+    同じチャンクは繰り返し検索結果に現れるため、結果をキャッシュします。
+    """
+    match = _MEETING_DATE_RE.search(doc_content)
+    if match:
+        try:
+            year, month, day = match.groups()
+            return datetime(int(year), int(month), int(day))
+        except ValueError:
+            return datetime.min
+    return datetime.min
+
+
+def _count_number_matches(numbers_in_question: List[str], doc_content: str) -> int:
+    """
+    質問の数値のうち、ドキュメント内容に（金額・日付として）含まれるものの数
+    
+    質問の数値がすべて見つかった時点で走査を打ち切ります。
+    """
+    wanted = set(numbers_in_question)
+    found = set()
+    for match in _DOC_NUMBER_RE.finditer(doc_content):
+        number = match.group(1)
+        if number in wanted:
+            found.add(number)
+            if len(found) == len(wanted):
+                break
+    return sum(1 for num in numbers_in_question if num in found)
+
+
+def _extract_company_keywords(question_text: str) -> List[str]:
+    """質問文から会社名・プロジェクトのキーワードを抽出"""
+    keywords = []
+    for pattern in _COMPANY_RES:
+        keywords.extend(pattern.findall(question_text))
+    return keywords
+
+
+# 再試行すれば成功する可能性のあるOpenAI APIのエラー（レート制限・タイムアウト・接続断・5xx）
+_RETRYABLE_LLM_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def _log_llm_retry(retry_state: RetryCallState):
+    """LLM呼び出しの再試行をエンジンのロガーに出力"""
+    engine = retry_state.args[0]
+    error = retry_state.outcome.exception()
+    engine.logger.warning(
+        f"LLM呼び出しに失敗したため再試行します "
+        f"({retry_state.attempt_number}回目, {retry_state.upcoming_sleep:.1f}秒後): {error!r}"
+    )
+
+
+# LLM呼び出しの再試行（最大3回、ジッター付き指数バックオフ）
+_llm_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_random_exponential(min=1, max=10),
+    retry=retry_if_exception_type(_RETRYABLE_LLM_ERRORS),
+    before_sleep=_log_llm_retry,
+    reraise=True,
+)
+
+
 class RAGChatEngine:
     """RAGチャットエンジンクラス"""
     
+    # 回答キャッシュの最大件数
+    RESPONSE_CACHE_SIZE = 512
+    
+    # 意味的キャッシュを使用する質問のコサイン類似度の下限
+    SEMANTIC_CACHE_THRESHOLD = 0.95
+    
+    # LLM呼び出し1回あたりのタイムアウト（秒）
+    LLM_TIMEOUT = 20
+    
+    # LLMに送る会話履歴の往復数（長い会話でも入力トークン数が増え続けないように制限）
+    CHAT_HISTORY_TURNS = 5
+    
     def __init__(
         self,
         vector_store_manager: VectorStoreManager,
@@ -77,13 +207,15 @@ class RAGChatEngine:
             log_path = vector_store_manager.metadata_path.parent / "logs"
         self.logger = setup_logger("RAGChat", log_path)
         
-        # OpenAI APIキーを設定
-        os.environ["OPENAI_API_KEY"] = openai_api_key
-        
-        # LLM設定
+        # LLM設定（APIキーは環境変数を介さず直接渡す）
+        # 再試行は _llm_retry で行うため、クライアント側の再試行は無効化
         self.llm = ChatOpenAI(
             model=chat_model,
-            temperature=temperature
+            api_key=openai_api_key,
+            temperature=temperature,
+            timeout=self.LLM_TIMEOUT,
+            max_retries=0,
+            stream_usage=True
         )
         
         # プロンプトテンプレート
@@ -92,32 +224,25 @@ class RAGChatEngine:
             input_variables=["context", "question"]
         )
         
-        # メモリ（会話履歴）
-        self.memory = ConversationBufferMemory(
+        # メモリ（会話履歴）。LLMには直近 CHAT_HISTORY_TURNS 往復分のみ送る
+        self.memory = ConversationBufferWindowMemory(
+            k=self.CHAT_HISTORY_TURNS,
             memory_key="chat_history",
             return_messages=True,
             output_key="answer"
         )
         
-        # RAGチェーン
-        self.chain = self._create_chain()
+        # 回答キャッシュ（プロンプトのハッシュ → 回答）
+        self._response_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._response_cache_lock = threading.Lock()
         
-        self.logger.info(f"RAGチャットエンジンを初期化しました (model={chat_model})")
-    
-    def _create_chain(self) -> ConversationalRetrievalChain:
-        """RAGチェーンを作成"""
-        retriever = self.vector_store_manager.get_retriever(k=self.top_k)
-        
-        chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=retriever,
-            memory=self.memory,
-            return_source_documents=True,
-            combine_docs_chain_kwargs={"prompt": self.qa_prompt},
-            verbose=False
+        # 意味的回答キャッシュ（言い回しが異なる同じ意図の質問に回答を再利用）
+        self._semantic_cache = SemanticCache(
+            vector_store_manager.metadata_path / "semantic_cache.npz",
+            threshold=self.SEMANTIC_CACHE_THRESHOLD
         )
         
-        return chain
+        self.logger.info(f"RAGチャットエンジンを初期化しました (model={chat_model})")
     
     def chat(self, question: str, max_sources: int = 1) -> Dict[str, any]:
         """
@@ -130,245 +255,500 @@ class RAGChatEngine:
         Returns:
             回答と関連ドキュメント情報
         """
+        result: Dict[str, any] = {}
+        for item in self.chat_stream(question, max_sources):
+            if isinstance(item, dict):
+                result = item
+        return result
+    
+    def chat_stream(
+        self,
+        question: str,
+        max_sources: int = 1
+    ) -> Iterator[Union[str, Dict[str, any]]]:
+        """
+        質問に対する回答を生成しながら順次返す
+        
+        回答のテキストを生成された順に文字列で返し、最後に chat() と同じ形式の
+        辞書（回答全文と関連ドキュメント情報）を返します。
+        キャッシュ済みの回答や定型の回答は1つの文字列として返します。
+        
+        Args:
+            question: ユーザーの質問
+            max_sources: 表示する最大ソース数（デフォルト1件）
+        
+        Yields:
+            回答の断片（str）、最後に回答と関連ドキュメント情報（dict）
+        """
         try:
             self.logger.info(f"質問: {question}")
             
-            # 類似度スコア付きで検索（回答生成とソース表示の両方で使用）
-            # 「最新」を含む質問の場合、または具体的な数値が含まれる場合は多めに取得
-            has_latest_keyword = any(keyword in question for keyword in ['最新', '最後', '直近', '現在'])
-            
-            # 質問から数値を抽出（金額、日付など）
-            import re
-            numbers_in_question = re.findall(r'(\d+(?:[.,]\d+)?)\s*(?:万円|円|回|年|月|日)', question)
-            has_specific_numbers = len(numbers_in_question) > 0
-            
-            search_k = 10 if (has_latest_keyword or has_specific_numbers) else max_sources
-            
-            search_results = self.vector_store_manager.search_with_score(
-                question, 
-                k=search_k
-            )
-            
-            if has_specific_numbers:
-                self.logger.info(f"質問に含まれる数値: {numbers_in_question}")
-            
-            if not search_results:
-                self.logger.warning("関連するドキュメントが見つかりませんでした")
-                return {
-                    "answer": "申し訳ございません。質問に関連する議事メモが見つかりませんでした。",
-                    "sources": [],
-                    "question": question
-                }
-            
-            # 質問に具体的な数値が含まれている場合は、その数値が一致するドキュメントを優先
-            if has_specific_numbers and search_results:
-                self.logger.info(f"数値一致フィルタリングを実行")
-                
-                # 「回目」「回の」が含まれている場合は、ファイル名の「第〇回」とマッチング
-                is_meeting_number_query = any(keyword in question for keyword in ['回目', '回の', '回目の'])
-                
-                # 各ドキュメントに含まれる数値を抽出
-                docs_with_matching_numbers = []
-                for doc, score in search_results:
-                    if is_meeting_number_query:
-                        # ファイル名から「第〇回」を抽出
-                        source = doc.metadata.get('source', '')
-                        meeting_numbers = re.findall(r'第(\d+)回', source)
-                        # 質問の数値とファイル名の回数が一致するか
-                        match_count = sum(1 for num in numbers_in_question if num in meeting_numbers)
-                        self.logger.info(f"ファイル名マッチング: {source} - 回数={meeting_numbers}, 一致数={match_count}")
-                    else:
-                        # ドキュメント内容から数値を抽出（金額など）
-                        doc_numbers = re.findall(r'(\d+(?:[.,]\d+)?)\s*(?:万円|円|年|月|日)', doc.page_content)
-                        # 質問の数値と一致する数が多いほど優先
-                        match_count = sum(1 for num in numbers_in_question if num in doc_numbers)
-                    docs_with_matching_numbers.append((doc, score, match_count))
-                
-                # 一致数でソート（多い順）、次に距離スコア（小さい順）
-                docs_sorted = sorted(docs_with_matching_numbers, key=lambda x: (-x[2], x[1]))
-                
-                # 一致がある場合は、最も一致度の高いものを選択
-                if docs_sorted[0][2] > 0:
-                    filtered_results = [(doc, score) for doc, score, count in docs_sorted[:max_sources] if count > 0]
-                    self.logger.info(f"数値一致によるフィルタリング: {[(doc.metadata.get('source', 'unknown'), count) for doc, score, count in docs_sorted[:3]]}")
-                else:
-                    # 一致がない場合は通常通り
-                    filtered_results = search_results[:max_sources]
+            # 質問の埋め込みは1回だけ計算し、検索と意味的キャッシュの両方に使用
+            question_vector = self._embed_question(question)
+            filtered_results = self._select_sources(question, max_sources, question_vector)
             
-            # 「最新」キーワードが含まれている場合は開催日時でソート
-            elif any(keyword in question for keyword in ['最新', '最後', '直近', '現在']) and search_results:
-                self.logger.info(f"「最新」キーワード検出 - 開催日時でソート")
-                
-                import re
-                from datetime import datetime
-                
-                def extract_meeting_date(doc_content):
-                    """ドキュメント内容から開催日時を抽出"""
-                    # ■日時: YYYY/MM/DD HH:MM のパターンをマッチ
-                    date_pattern = r'■日時[：:]\s*(\d{4})[//-](\d{1,2})[//-](\d{1,2})'
-                    match = re.search(date_pattern, doc_content)
-                    if match:
-                        try:
-                            year, month, day = match.groups()
-                            date_str = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                            return datetime.strptime(date_str, "%Y-%m-%d")
-                        except:
-                            return datetime.min
-                    return datetime.min  # 日付が見つからない場合は最古の日付
-                
-                def extract_company_keywords(question_text):
-                    """質問文から会社名・プロジェクトのキーワードを抽出"""
-                    # 一般的な会社名パターン
-                    company_patterns = [
-                        r'([\w\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]+(?:株式会社|インダストリー|商事|ソリューションズ|フロンティア))',
-                        r'([A-Z][a-z]+)',  # 英語の会社名
-                    ]
-                    keywords = []
-                    for pattern in company_patterns:
-                        matches = re.findall(pattern, question_text)
-                        keywords.extend(matches)
-                    return keywords
-                
-                # 質問から会社名キーワードを抽出
-                company_keywords = extract_company_keywords(question)
-                self.logger.info(f"抽出された会社キーワード: {company_keywords}")
-                
-                # 会社名が含まれるドキュメントをフィルタリング
-                if company_keywords:
-                    # いずれかのキーワードが含まれるドキュメントのみ
-                    filtered_by_company = [
-                        (doc, score) for doc, score in search_results
-                        if any(keyword in doc.metadata.get('source', '') or keyword in doc.page_content 
-                               for keyword in company_keywords)
-                    ]
-                    if filtered_by_company:
-                        search_results = filtered_by_company
-                        self.logger.info(f"会社名フィルタリング後: {len(search_results)}件")
+            # フィルタリング後のドキュメントを使用して回答を生成
+            # チェーンを直接実行するのではなく、LLMに直接問い合わせる
+            if filtered_results:
+                prompt, context = self._build_prompt(question, filtered_results, max_sources)
                 
-                # 開催日時でソート（新しい順）
-                search_results_with_dates = []
-                for doc, score in search_results:
-                    meeting_date = extract_meeting_date(doc.page_content)
-                    search_results_with_dates.append((doc, score, meeting_date))
+                # 会話履歴（直近の往復分）を取得
+                chat_history = self.memory.buffer_as_messages
                 
-                # 日付でソート（新しい順）
-                search_results_sorted = sorted(
-                    search_results_with_dates, 
-                    key=lambda x: x[2], 
-                    reverse=True
+                answer, cache_entry = self._lookup_cached_answer(
+                    question, prompt, context, chat_history, question_vector
                 )
+                if answer is None:
+                    # 生成されたトークンを順次返す
+                    answer_parts = []
+                    for chunk in self._stream_llm(self._llm_messages(prompt, chat_history)):
+                        if chunk.content:
+                            answer_parts.append(chunk.content)
+                            yield chunk.content
+                    answer = "".join(answer_parts)
+                    self._store_answer(question, answer, cache_entry)
+                else:
+                    yield answer
                 
-                # (doc, score)の形式に戻す
-                filtered_results = [(doc, score) for doc, score, date in search_results_sorted[:max_sources]]
-                
-                self.logger.info(f"開催日時順ソート後の最上位: {[(doc.metadata.get('source', 'unknown'), date.strftime('%Y-%m-%d') if date != datetime.min else 'N/A') for doc, score, date in search_results_sorted[:max_sources]]}")
+                # メモリに追加
+                self.memory.save_context({"question": question}, {"answer": answer})
             else:
-                # 通常は距離スコア順
-                filtered_results = search_results[:max_sources] if search_results else []
+                answer = NO_RESULT_ANSWER
+                yield answer
             
-            # ログに距離スコアを出力（デバッグ用）
-            if filtered_results:
-                self.logger.info(f"最終選択ドキュメント: {[(doc.metadata.get('source', 'unknown'), round(score, 3)) for doc, score in filtered_results]}")
+            yield self._build_result(question, answer, filtered_results, max_sources)
+            
+        except Exception as e:
+            self.logger.error(f"チャットエラー: {e}")
+            yield self._error_result(question, e)
+    
+    async def achat(
+        self,
+        question: str,
+        max_sources: int = 1,
+        use_memory: bool = True
+    ) -> Dict[str, any]:
+        """
+        質問に対して回答を生成（非同期版）
+        
+        検索や埋め込みなどの同期処理はスレッドで実行し、LLMの呼び出しは
+        ainvoke で待機するため、複数の質問を並行して処理できます。
+        
+        Args:
+            question: ユーザーの質問
+            max_sources: 表示する最大ソース数（デフォルト1件）
+            use_memory: 会話履歴を参照・更新する場合True
+        
+        Returns:
+            chat() と同じ形式の回答と関連ドキュメント情報
+        """
+        try:
+            self.logger.info(f"質問: {question}")
+            question_vector = await asyncio.to_thread(self._embed_question, question)
+            filtered_results = await asyncio.to_thread(
+                self._select_sources, question, max_sources, question_vector
+            )
             
-            # フィルタリング後のドキュメントを使用して回答を生成
-            # チェーンを直接実行するのではなく、LLMに直接問い合わせる
             if filtered_results:
-                # コンテキストを構築
-                context_parts = []
-                for doc, _ in filtered_results[:max_sources]:
-                    source_name = doc.metadata.get('source', '不明')
-                    context_parts.append(f"【{source_name}】\n{doc.page_content}")
-                context = "\n\n".join(context_parts)
+                prompt, context = self._build_prompt(question, filtered_results, max_sources)
+                chat_history = self.memory.buffer_as_messages if use_memory else []
                 
-                # プロンプトを構築
-                prompt = self.qa_prompt.format(context=context, question=question)
-                
-                # 会話履歴を取得
-                chat_history = self.memory.chat_memory.messages
-                
-                # LLMで回答を生成
-                from langchain_core.messages import HumanMessage, SystemMessage
-                messages = [SystemMessage(content=SYSTEM_PROMPT)]
-                messages.extend(chat_history)
-                messages.append(HumanMessage(content=prompt))
-                
-                answer = self.llm.invoke(messages).content
+                answer, cache_entry = self._lookup_cached_answer(
+                    question, prompt, context, chat_history, question_vector
+                )
+                if answer is None:
+                    answer = await self._ainvoke_llm(self._llm_messages(prompt, chat_history))
+                    await asyncio.to_thread(self._store_answer, question, answer, cache_entry)
                 
-                # メモリに追加
-                self.memory.save_context({"question": question}, {"answer": answer})
+                if use_memory:
+                    self.memory.save_context({"question": question}, {"answer": answer})
             else:
-                answer = "申し訳ございません。質問に関連する議事メモが見つかりませんでした。"
+                answer = NO_RESULT_ANSWER
+            
+            return self._build_result(question, answer, filtered_results, max_sources)
+            
+        except Exception as e:
+            self.logger.error(f"チャットエラー: {e}")
+            return self._error_result(question, e)
+    
+    async def achat_many(
+        self,
+        questions: List[str],
+        concurrency: int = 10,
+        max_sources: int = 1
+    ) -> List[Dict[str, any]]:
+        """
+        互いに独立した複数の質問に並行して回答（一括評価・要約処理向け）
+        
+        各質問は会話履歴を参照・更新しません。同時に処理する質問数は
+        concurrency 件までに制限します。
+        
+        Args:
+            questions: 質問のリスト
+            concurrency: 同時に処理する最大件数
+            max_sources: 表示する最大ソース数
+        
+        Returns:
+            質問と同じ順序の回答のリスト
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def bounded(question: str) -> Dict[str, any]:
+            async with semaphore:
+                return await self.achat(question, max_sources=max_sources, use_memory=False)
+        
+        return list(await asyncio.gather(*(bounded(question) for question in questions)))
+    
+    def _select_sources(
+        self,
+        question: str,
+        max_sources: int,
+        question_vector: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        質問に関連するドキュメントを検索し、回答に使用するものを選択
+        
+        Args:
+            question: ユーザーの質問
+            max_sources: 選択する最大ドキュメント数
+            question_vector: 質問の埋め込みベクトル（Noneの場合は検索時に計算）
+        
+        Returns:
+            (ドキュメント, 距離スコア) のリスト（見つからない場合は空）
+        """
+        # 類似度スコア付きで検索（回答生成とソース表示の両方で使用）
+        # 「最新」を含む質問の場合、または具体的な数値が含まれる場合は多めに取得
+        has_latest_keyword = _LATEST_KEYWORD_RE.search(question) is not None
+        
+        # 質問から数値を抽出（金額、日付など）
+        numbers_in_question = _QUESTION_NUMBER_RE.findall(question)
+        has_specific_numbers = len(numbers_in_question) > 0
+        
+        search_k = 10 if (has_latest_keyword or has_specific_numbers) else max_sources
+        
+        search_results = self.vector_store_manager.search_with_score(
+            question, 
+            k=search_k,
+            embedding=question_vector
+        )
+        
+        if has_specific_numbers:
+            self.logger.info(f"質問に含まれる数値: {numbers_in_question}")
+        
+        if not search_results:
+            self.logger.warning("関連するドキュメントが見つかりませんでした")
+            return []
+        
+        # 質問に具体的な数値が含まれている場合は、その数値が一致するドキュメントを優先
+        if has_specific_numbers and search_results:
+            self.logger.info(f"数値一致フィルタリングを実行")
             
-            # ソースドキュメント情報を整形（filtered_resultsをそのまま使用）
-            sources = []
-            seen_sources = set()
+            # 「回目」「回の」が含まれている場合は、ファイル名の「第〇回」とマッチング
+            is_meeting_number_query = _MEETING_QUERY_RE.search(question) is not None
             
-            for doc, score in filtered_results[:max_sources]:
-                source_name = doc.metadata.get("source", "不明")
-                folder_path = doc.metadata.get("folder_path", "")
-                file_id = doc.metadata.get("file_id", "")
-                file_url = doc.metadata.get("file_url", "")
-                data_source = doc.metadata.get("data_source", "unknown")
+            # 各ドキュメントに含まれる数値を抽出
+            docs_with_matching_numbers = []
+            for doc, score in search_results:
+                if is_meeting_number_query:
+                    # ファイル名から「第〇回」を抽出
+                    source = doc.metadata.get('source', '')
+                    meeting_numbers = _MEETING_NUMBER_RE.findall(source)
+                    # 質問の数値とファイル名の回数が一致するか
+                    match_count = sum(1 for num in numbers_in_question if num in meeting_numbers)
+                    self.logger.info(f"ファイル名マッチング: {source} - 回数={meeting_numbers}, 一致数={match_count}")
+                else:
+                    # ドキュメント内容の数値（金額など）が質問の数値と一致する数が多いほど優先
+                    match_count = _count_number_matches(numbers_in_question, doc.page_content)
+                docs_with_matching_numbers.append((doc, score, match_count))
                 
-                # 重複を避ける（ファイル単位で）
-                source_key = f"{file_id}"
-                if source_key not in seen_sources:
-                    # ドキュメント全文を取得（同じfile_idのチャンクを結合）
-                    full_content = self._get_full_document_content(file_id, filtered_results)
-                    
-                    sources.append({
-                        "name": source_name,
-                        "folder_path": folder_path,
-                        "content": full_content,
-                        "file_id": file_id,
-                        "file_url": file_url,
-                        "data_source": data_source,
-                        "distance": round(score, 3),  # 距離スコア（デバッグ用）
-                        "relevance_score": round(1.0 - min(score, 1.0), 3)  # 距離を類似度に変換
-                    })
-                    seen_sources.add(source_key)
+                # 1件のみ選択する場合、距離が最小の先頭ドキュメントが質問の数値をすべて含んでいれば
+                # 並べ替えても先頭のままなので、残りのドキュメントは調べない
+                if max_sources == 1 and len(docs_with_matching_numbers) == 1 and match_count == len(numbers_in_question):
+                    break
             
-            self.logger.info(f"回答生成完了 (参照ドキュメント数: {len(sources)})")
+            # 一致数でソート（多い順）、次に距離スコア（小さい順）
+            docs_sorted = sorted(docs_with_matching_numbers, key=lambda x: (-x[2], x[1]))
             
-            return {
-                "answer": answer,
-                "sources": sources,
-                "question": question
-            }
+            # 一致がある場合は、最も一致度の高いものを選択
+            if docs_sorted[0][2] > 0:
+                filtered_results = [(doc, score) for doc, score, count in docs_sorted[:max_sources] if count > 0]
+                self.logger.info(f"数値一致によるフィルタリング: {[(doc.metadata.get('source', 'unknown'), count) for doc, score, count in docs_sorted[:3]]}")
+            else:
+                # 一致がない場合は通常通り
+                filtered_results = search_results[:max_sources]
+        
+        # 「最新」キーワードが含まれている場合は開催日時でソート
+        elif has_latest_keyword and search_results:
+            self.logger.info(f"「最新」キーワード検出 - 開催日時でソート")
+            
+            # 質問から会社名キーワードを抽出
+            company_keywords = _extract_company_keywords(question)
+            self.logger.info(f"抽出された会社キーワード: {company_keywords}")
+            
+            # 会社名が含まれるドキュメントをフィルタリング
+            if company_keywords:
+                # いずれかのキーワードが含まれるドキュメントのみ（全キーワードを1回の走査で照合）
+                company_re = re.compile('|'.join(map(re.escape, dict.fromkeys(company_keywords))))
+                filtered_by_company = [
+                    (doc, score) for doc, score in search_results
+                    if company_re.search(doc.metadata.get('source', '')) or company_re.search(doc.page_content)
+                ]
+                if filtered_by_company:
+                    search_results = filtered_by_company
+                    self.logger.info(f"会社名フィルタリング後: {len(search_results)}件")
+            
+            # 開催日時でソート（新しい順）
+            search_results_with_dates = []
+            for doc, score in search_results:
+                meeting_date = _extract_meeting_date(doc.page_content)
+                search_results_with_dates.append((doc, score, meeting_date))
+            
+            # 日付でソート（新しい順）
+            search_results_sorted = sorted(
+                search_results_with_dates, 
+                key=lambda x: x[2], 
+                reverse=True
+            )
             
+            # (doc, score)の形式に戻す
+            filtered_results = [(doc, score) for doc, score, date in search_results_sorted[:max_sources]]
+            
+            self.logger.info(f"開催日時順ソート後の最上位: {[(doc.metadata.get('source', 'unknown'), date.strftime('%Y-%m-%d') if date != datetime.min else 'N/A') for doc, score, date in search_results_sorted[:max_sources]]}")
+        else:
+            # 通常は距離スコア順
+            filtered_results = search_results[:max_sources] if search_results else []
+        
+        # ログに距離スコアを出力（デバッグ用）
+        if filtered_results:
+            self.logger.info(f"最終選択ドキュメント: {[(doc.metadata.get('source', 'unknown'), round(score, 3)) for doc, score in filtered_results]}")
+        
+        return filtered_results
+    
+    def _build_prompt(
+        self,
+        question: str,
+        filtered_results: List[Tuple[Document, float]],
+        max_sources: int
+    ) -> Tuple[str, str]:
+        """
+        選択したドキュメントからプロンプトを構築
+        
+        Returns:
+            (プロンプト, コンテキスト)
+        """
+        context_parts = []
+        for doc, _ in filtered_results[:max_sources]:
+            source_name = doc.metadata.get('source', '不明')
+            context_parts.append(f"【{source_name}】\n{doc.page_content}")
+        context = "\n\n".join(context_parts)
+        
+        return self.qa_prompt.format(context=context, question=question), context
+    
+    @staticmethod
+    def _llm_messages(prompt: str, chat_history: list) -> list:
+        """LLMに渡すメッセージ（システムプロンプト・会話履歴・質問）を構築"""
+        messages = [SystemMessage(content=SYSTEM_PROMPT)]
+        messages.extend(chat_history)
+        messages.append(HumanMessage(content=prompt))
+        return messages
+    
+    @_llm_retry
+    async def _ainvoke_llm(self, messages: list) -> str:
+        """LLMで回答を生成（非同期版、一時的なエラーは再試行）"""
+        response = await self.llm.ainvoke(messages)
+        self._log_token_usage(response.usage_metadata)
+        return response.content
+    
+    @_llm_retry
+    def _open_llm_stream(self, messages: list) -> Tuple[Optional[object], Iterator]:
+        """
+        LLMのストリーミング生成を開始し、最初のチャンクを受信
+        
+        最初のチャンクを受信するまでの一時的なエラーは再試行します。
+        
+        Returns:
+            (最初のチャンク（生成結果が空の場合はNone）, 以降のチャンクのイテレータ)
+        """
+        stream = iter(self.llm.stream(messages))
+        return next(stream, None), stream
+    
+    def _stream_llm(self, messages: list) -> Iterator:
+        """
+        LLMで回答を生成しながらチャンクを順次返す
+        
+        回答の表示を始めた後に失敗した場合は、同じ回答を二重に表示しないよう
+        再試行せずにエラーとします。
+        """
+        first, stream = self._open_llm_stream(messages)
+        if first is None:
+            return
+        for chunk in itertools.chain((first,), stream):
+            if chunk.usage_metadata:
+                self._log_token_usage(chunk.usage_metadata)
+            yield chunk
+    
+    def _log_token_usage(self, usage: Dict[str, any]):
+        """入力トークン数とプロンプトキャッシュの利用状況をログに出力"""
+        input_tokens = usage.get("input_tokens", 0)
+        cached_tokens = usage.get("input_token_details", {}).get("cache_read", 0)
+        if input_tokens:
+            self.logger.info(
+                f"入力トークン数: {input_tokens} "
+                f"(キャッシュ済み: {cached_tokens}, {cached_tokens / input_tokens:.0%})"
+            )
+    
+    def _lookup_cached_answer(
+        self,
+        question: str,
+        prompt: str,
+        context: str,
+        chat_history: list,
+        question_vector: Optional[List[float]] = None
+    ) -> Tuple[Optional[str], Optional[Dict[str, any]]]:
+        """
+        キャッシュ済みの回答を検索
+        
+        会話履歴がない場合のみ、同じプロンプト（質問と参照内容）の回答、
+        または参照内容が同じで意味の近い質問の回答（question_vector がある場合）を
+        再利用します。
+        
+        Returns:
+            (キャッシュ済みの回答またはNone, 回答を格納するためのキャッシュ情報)
+        """
+        if chat_history:
+            return None, None
+        
+        cache_entry: Dict[str, any] = {
+            "key": hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+            "vector": None,
+            "context_sig": None,
+        }
+        answer = self._get_cached_response(cache_entry["key"])
+        
+        # 完全一致しない場合は、参照内容が同じで意味の近い質問の回答を再利用
+        if answer is None:
+            cache_entry["context_sig"] = hashlib.sha256(context.encode('utf-8')).hexdigest()
+            cache_entry["vector"] = question_vector
+            if cache_entry["vector"] is not None:
+                answer = self._semantic_cache.lookup(cache_entry["vector"], cache_entry["context_sig"])
+                if answer is not None:
+                    self._put_cached_response(cache_entry["key"], answer)
+        
+        if answer is not None:
+            self.logger.info("キャッシュ済みの回答を使用")
+        return answer, cache_entry
+    
+    def _store_answer(self, question: str, answer: str, cache_entry: Optional[Dict[str, any]]):
+        """生成した回答をキャッシュに格納（空の回答は格納しない）"""
+        if cache_entry is None or not answer:
+            return
+        self._put_cached_response(cache_entry["key"], answer)
+        if cache_entry["vector"] is not None:
+            self._semantic_cache.add(question, cache_entry["vector"], cache_entry["context_sig"], answer)
+    
+    def _build_result(
+        self,
+        question: str,
+        answer: str,
+        filtered_results: List[Tuple[Document, float]],
+        max_sources: int
+    ) -> Dict[str, any]:
+        """回答とソースドキュメント情報から結果の辞書を構築"""
+        # ソースドキュメント情報を整形（filtered_resultsをそのまま使用）
+        sources = []
+        seen_sources = set()
+        
+        # ドキュメント全文（同じfile_idのチャンクを結合）
+        full_contents = self._assemble_document_contents(filtered_results)
+        
+        for doc, score in filtered_results[:max_sources]:
+            source_name = doc.metadata.get("source", "不明")
+            folder_path = doc.metadata.get("folder_path", "")
+            file_id = doc.metadata.get("file_id", "")
+            file_url = doc.metadata.get("file_url", "")
+            data_source = doc.metadata.get("data_source", "unknown")
+            
+            # 重複を避ける（ファイル単位で）
+            source_key = f"{file_id}"
+            if source_key not in seen_sources:
+                sources.append({
+                    "name": source_name,
+                    "folder_path": folder_path,
+                    "content": full_contents.get(file_id, ""),
+                    "file_id": file_id,
+                    "file_url": file_url,
+                    "data_source": data_source,
+                    "distance": round(score, 3),  # 距離スコア（デバッグ用）
+                    "relevance_score": round(1.0 - min(score, 1.0), 3)  # 距離を類似度に変換
+                })
+                seen_sources.add(source_key)
+        
+        self.logger.info(f"回答生成完了 (参照ドキュメント数: {len(sources)})")
+        
+        return {
+            "answer": answer,
+            "sources": sources,
+            "question": question
+        }
+    
+    @staticmethod
+    def _error_result(question: str, error: Exception) -> Dict[str, any]:
+        """エラー時の結果の辞書を構築"""
+        return {
+            "answer": f"エラーが発生しました: {str(error)}",
+            "sources": [],
+            "question": question,
+            "error": True
+        }
+    
+    def _embed_question(self, question: str) -> Optional[List[float]]:
+        """質問の埋め込みベクトルを取得（失敗した場合はNone）"""
+        try:
+            return self.vector_store_manager.embed_query(question)
         except Exception as e:
-            self.logger.error(f"チャットエラー: {e}")
-            return {
-                "answer": f"エラーが発生しました: {str(e)}",
-                "sources": [],
-                "question": question
-            }
+            self.logger.warning(f"質問の埋め込みに失敗: {e}")
+            return None
+    
+    def _get_cached_response(self, cache_key: str) -> Optional[str]:
+        """キャッシュ済みの回答を取得（無い場合はNone）"""
+        with self._response_cache_lock:
+            answer = self._response_cache.get(cache_key)
+            if answer is not None:
+                self._response_cache.move_to_end(cache_key)
+            return answer
     
-    def _get_full_document_content(
-        self, 
-        file_id: str, 
-        search_results: List[tuple]
-    ) -> str:
+    def _put_cached_response(self, cache_key: str, answer: str):
+        """回答をキャッシュに追加（上限を超えた場合は最も古いものを破棄）"""
+        with self._response_cache_lock:
+            self._response_cache[cache_key] = answer
+            self._response_cache.move_to_end(cache_key)
+            while len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+    
+    @staticmethod
+    def _assemble_document_contents(search_results: List[tuple]) -> Dict[str, str]:
         """
-        同じfile_idを持つ全チャンクを結合して全文を取得
+        検索結果のチャンクをfile_idごとに結合して全文を取得
         
         Args:
-            file_id: ファイルID
             search_results: (Document, score)のタプルのリスト
         
         Returns:
-            ドキュメント全文
+            file_id → ドキュメント全文（チャンクインデックス順に結合）
         """
-        # 同じfile_idのチャンクを収集
-        chunks = []
+        # 1回の走査でfile_idごとにチャンクを収集
+        chunks_by_file: Dict[str, List[Tuple[int, str]]] = {}
         for doc, _ in search_results:
-            if doc.metadata.get("file_id") == file_id:
-                chunk_index = doc.metadata.get("chunk_index", 0)
-                chunks.append((chunk_index, doc.page_content))
+            chunks_by_file.setdefault(doc.metadata.get("file_id"), []).append(
+                (doc.metadata.get("chunk_index", 0), doc.page_content)
+            )
         
         # チャンクインデックス順にソートして結合
-        chunks.sort(key=lambda x: x[0])
-        return "\n".join([content for _, content in chunks])
+        contents = {}
+        for file_id, chunks in chunks_by_file.items():
+            chunks.sort(key=lambda x: x[0])
+            contents[file_id] = "\n".join([content for _, content in chunks])
+        return contents
     
     def search_documents(self, query: str, k: Optional[int] = None) -> List[Dict]:
         """
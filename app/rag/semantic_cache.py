@@ -0,0 +1,183 @@
+"""
+意味的回答キャッシュモジュール
+質問の埋め込みベクトルの類似度で、言い回しの異なる同じ意図の質問に回答を再利用する
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    意味的回答キャッシュクラス
+    
+    参照内容（コンテキスト）が同一で、質問のコサイン類似度がしきい値以上の
+    過去の回答を返します。キャッシュは allow_pickle=False で読み込める
+    .npz 形式で保存します。
+    """
+    
+    def __init__(
+        self,
+        cache_file: Optional[Path] = None,
+        threshold: float = 0.95,
+        max_entries: int = 256
+    ):
+        """
+        Args:
+            cache_file: 保存先ファイル（Noneの場合は保存しない）
+            threshold: キャッシュを使用するコサイン類似度の下限
+            max_entries: 保持する最大件数（超えた場合は古いものから破棄）
+        """
+        self.cache_file = cache_file
+        self.threshold = threshold
+        self.max_entries = max_entries
+        
+        self._questions: List[str] = []
+        self._context_sigs: List[str] = []
+        self._answers: List[str] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        
+        self._load()
+    
+    def __len__(self) -> int:
+        return len(self._answers)
+    
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> Optional[np.ndarray]:
+        """ベクトルを正規化（ゼロベクトルの場合はNone）"""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        if array.ndim != 1 or norm == 0.0:
+            return None
+        return array / norm
+    
+    def lookup(self, vector: Sequence[float], context_sig: str) -> Optional[str]:
+        """
+        類似した質問の回答を検索
+        
+        Args:
+            vector: 質問の埋め込みベクトル
+            context_sig: 参照内容のハッシュ（一致するエントリのみ対象）
+        
+        Returns:
+            キャッシュされた回答（該当なしの場合はNone）
+        """
+        query = self._normalize(vector)
+        if query is None:
+            return None
+        
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                return None
+            
+            candidates = [i for i, sig in enumerate(self._context_sigs) if sig == context_sig]
+            if not candidates:
+                return None
+            
+            similarities = self._vectors[candidates] @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            
+            index = candidates[best]
+            logger.debug(
+                f"Semantic cache hit (similarity={similarities[best]:.3f}): {self._questions[index]}"
+            )
+            return self._answers[index]
+    
+    def add(self, question: str, vector: Sequence[float], context_sig: str, answer: str):
+        """
+        回答をキャッシュに追加して保存
+        
+        Args:
+            question: 質問
+            vector: 質問の埋め込みベクトル
+            context_sig: 参照内容のハッシュ
+            answer: 回答（空の場合は追加しない）
+        """
+        if not answer:
+            return
+        
+        normalized = self._normalize(vector)
+        if normalized is None:
+            return
+        
+        with self._lock:
+            if self._vectors is not None and self._vectors.shape[1] != normalized.shape[0]:
+                # 埋め込みモデルが変わった場合は古いエントリを破棄
+                self._clear()
+            
+            self._questions.append(question)
+            self._context_sigs.append(context_sig)
+            self._answers.append(answer)
+            row = normalized[np.newaxis, :]
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+            
+            overflow = len(self._answers) - self.max_entries
+            if overflow > 0:
+                del self._questions[:overflow]
+                del self._context_sigs[:overflow]
+                del self._answers[:overflow]
+                self._vectors = self._vectors[overflow:]
+            
+            self._save()
+    
+    def _clear(self):
+        """全エントリを破棄"""
+        self._questions = []
+        self._context_sigs = []
+        self._answers = []
+        self._vectors = None
+    
+    def _load(self):
+        """保存されたキャッシュを読み込み（読み込めない場合は空のまま）"""
+        if self.cache_file is None or not self.cache_file.exists():
+            return
+        
+        try:
+            with np.load(self.cache_file, allow_pickle=False) as data:
+                vectors = data["vectors"].astype(np.float32)
+                questions = data["questions"].tolist()
+                context_sigs = data["context_sigs"].tolist()
+                answers = data["answers"].tolist()
+            
+            if vectors.ndim != 2 or not (len(vectors) == len(questions) == len(context_sigs) == len(answers)):
+                logger.error(f"Semantic cache file is inconsistent, ignoring: {self.cache_file}")
+                return
+            
+            self._vectors = vectors if len(vectors) else None
+            self._questions = questions
+            self._context_sigs = context_sigs
+            self._answers = answers
+        
+        except Exception as e:
+            logger.error(f"Failed to load semantic cache: {e}")
+    
+    def _save(self):
+        """キャッシュをファイルに保存（一時ファイルに書いてから置き換え）"""
+        if self.cache_file is None or self._vectors is None:
+            return
+        
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+            with open(tmp_file, "wb") as f:
+                np.savez(
+                    f,
+                    vectors=self._vectors,
+                    questions=np.array(self._questions, dtype=str),
+                    context_sigs=np.array(self._context_sigs, dtype=str),
+                    answers=np.array(self._answers, dtype=str),
+                )
+            os.replace(tmp_file, self.cache_file)
+        
+        except OSError as e:
+            logger.error(f"Failed to save semantic cache to {self.cache_file}: {e}")
@@ -5,11 +5,25 @@
 
 import json
 import hashlib
+import io
 import logging
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from functools import cached_property
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Set, Tuple, Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, Set, Tuple, Optional, Union
 from datetime import datetime
 
+from . import fast_json
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,6 +40,13 @@ class DiffDetector:
     型安全性とセキュリティを保証します。
     """
     
+    # パス要素としての ".." （"/" と "\\" のどちらの区切りも対象。"my..project" は一致しない）
+    PARENT_REFERENCE = re.compile(r"(?:^|[/\\])\.\.(?:[/\\]|$)")
+    
+    # content_hash の計算方式（方式を変更した場合は値を変えること）
+    # 保存済みの値と異なるエントリは、ハッシュが比較できないため更新として扱う
+    HASH_ALGORITHM = "sha256"
+    
     def __init__(self, metadata_path: Path):
         """
         差分検出器を初期化
@@ -53,7 +74,28 @@ class DiffDetector:
             )
         
         self.metadata_file = self.metadata_path / "file_metadata.json"
-        self.metadata: Dict[str, dict] = self._load_metadata()
+        self.lock_file = self.metadata_path / "file_metadata.json.lock"
+        
+        # 最後に読み込み・保存した時点のファイルの状態と、それ以降に変更したファイルID
+        self._file_stamp: Optional[Tuple[int, int, int]] = None
+        self._changed_ids: Set[str] = set()
+        
+        # 最後に保存した内容のダイジェスト（同じ内容の再書き込みを省略するため）
+        self._saved_digest: Optional[bytes] = None
+        
+        # deferred_save() のネスト数と、保存を保留している変更の有無
+        self._defer_depth = 0
+        self._save_pending = False
+    
+    @cached_property
+    def metadata(self) -> Dict[str, dict]:
+        """
+        保存済みのメタデータ（{file_id: ファイル情報}）
+        
+        検索だけを行う場合などに不要な読み込みをしないよう、
+        初回アクセス時にファイルから読み込みます。
+        """
+        return self._load_metadata()
     
     def _load_metadata(self) -> Dict[str, dict]:
         """
@@ -62,12 +104,12 @@ class DiffDetector:
         Returns:
             メタデータ辞書
         """
-        if not self.metadata_file.exists():
+        self._file_stamp = self._stat_metadata_file()
+        if self._file_stamp is None:
             return {}
         
         try:
-            with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self._read_metadata_file()
             
             # 型チェック：辞書であることを確認
             if not isinstance(data, dict):
@@ -78,7 +120,7 @@ class DiffDetector:
                 return {}
             
             return data
-            
+        
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse metadata JSON: {e}")
             return {}
@@ -86,40 +128,157 @@ class DiffDetector:
             logger.error(f"Failed to load metadata: {e}")
             return {}
     
+    def _read_metadata_file(self):
+        """
+        メタデータファイルを読み込んでデコード
+        
+        ファイルをメモリマップしてそのままデコーダに渡すため、
+        ファイル全体を bytes にコピーしません。
+        
+        Raises:
+            OSError: ファイルを読み込めない場合
+            json.JSONDecodeError: JSONとして不正な場合（空ファイルを含む）
+        """
+        with open(self.metadata_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # 空のファイルはメモリマップできない
+                return fast_json.loads(b"")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                    memoryview(mapped) as view:
+                return fast_json.loads(view)
+    
+    def _stat_metadata_file(self) -> Optional[Tuple[int, int, int]]:
+        """メタデータファイルの (inode, 更新時刻, サイズ) を取得（存在しない場合はNone）"""
+        try:
+            stat = self.metadata_file.stat()
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
+    @contextmanager
+    def _metadata_lock(self) -> Iterator[None]:
+        """
+        メタデータファイルの排他ロック（別プロセスの DiffDetector と保存が重ならないようにする）
+        
+        fcntl が使えない環境ではロックしません。
+        """
+        with open(self.lock_file, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            yield
+    
+    def _merge_external_changes(self):
+        """
+        別のインスタンスが保存したメタデータに、このインスタンスの変更を反映
+        
+        このインスタンスで更新・削除したファイルID以外は保存済みの内容を採用します。
+        保存済みのファイルが読み込めない場合は何もしません。
+        """
+        try:
+            stored = self._read_metadata_file()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read metadata for merging, overwriting it: {e}")
+            return
+        if not isinstance(stored, dict):
+            return
+        
+        for file_id in self._changed_ids:
+            if file_id in self.metadata:
+                stored[file_id] = self.metadata[file_id]
+            else:
+                stored.pop(file_id, None)
+        
+        self.metadata.clear()
+        self.metadata.update(stored)
+        logger.info("Metadata file was updated by another instance; merged changes")
+    
     def _save_metadata(self):
         """
         メタデータを保存
         
+        一時ファイルに書き込んでから置き換えるため、書き込み中に異常終了しても
+        保存済みのメタデータが壊れることはありません。保存中はロックファイルで
+        他のインスタンスの保存を待たせ、前回の読み込み・保存以降に別のインスタンスが
+        保存していた場合は、このインスタンスで変更したファイルのみを反映します。
+        前回保存した内容から変わっていない場合は書き込みません。
+        
         Raises:
             DiffDetectorError: 保存に失敗した場合
         """
+        tmp_file = self.metadata_file.with_name(self.metadata_file.name + ".tmp")
         try:
             # ディレクトリが存在しない場合は作成
             self.metadata_path.mkdir(parents=True, exist_ok=True)
             
-            # JSONにシリアライズ可能か確認
-            json_str = json.dumps(self.metadata, ensure_ascii=False, indent=2)
-            
-            # ファイルに書き込み
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                f.write(json_str)
+            with self._metadata_lock():
+                if self._changed_ids and self._stat_metadata_file() not in (None, self._file_stamp):
+                    self._merge_external_changes()
+                
+                # JSONにシリアライズ可能か確認
+                data = fast_json.dumps(self.metadata)
                 
+                # 前回保存した内容と同じで、その後ファイルが変更されていなければ書き込みを省略
+                # （SHA-256 はCPUの専用命令で計算されるため、大きなデータでは BLAKE2 より速い）
+                digest = hashlib.sha256(data).digest()
+                if digest == self._saved_digest and self._stat_metadata_file() == self._file_stamp:
+                    self._changed_ids.clear()
+                    return
+                
+                # 一時ファイルに書き込んでから置き換え
+                tmp_file.write_bytes(data)
+                os.replace(tmp_file, self.metadata_file)
+                
+                self._file_stamp = self._stat_metadata_file()
+                self._saved_digest = digest
+                self._changed_ids.clear()
+        
         except TypeError as e:
             raise DiffDetectorError(
                 f"Failed to serialize metadata to JSON: {e}. "
                 "Metadata contains non-serializable objects."
             ) from e
         except OSError as e:
+            tmp_file.unlink(missing_ok=True)
             raise DiffDetectorError(
                 f"Failed to save metadata to {self.metadata_file}: {e}"
             ) from e
     
-    def _calculate_hash(self, content: bytes) -> str:
+    def _request_save(self):
+        """メタデータを保存（deferred_save() の中では終了時まで保留）"""
+        if self._defer_depth:
+            self._save_pending = True
+        else:
+            self._save_metadata()
+    
+    @contextmanager
+    def deferred_save(self) -> Iterator["DiffDetector"]:
+        """
+        ブロック内のメタデータ更新・削除の保存をまとめて1回にする
+        
+        ブロックを抜けるとき（例外発生時を含む）に変更があれば保存します。
+        入れ子にした場合は最も外側のブロックを抜けるときに保存します。
+        
+        Raises:
+            DiffDetectorError: 保存に失敗した場合
+        """
+        self._defer_depth += 1
+        try:
+            yield self
+        finally:
+            self._defer_depth -= 1
+            if not self._defer_depth and self._save_pending:
+                self._save_pending = False
+                self._save_metadata()
+    
+    def _calculate_hash(self, content: Union[bytes, bytearray, memoryview, BinaryIO]) -> str:
         """
         コンテンツのハッシュ値を計算
         
+        バイナリのファイルオブジェクトを渡した場合は、全体をメモリに読み込まず
+        hashlib.file_digest（Python 3.11以降）でブロック単位に処理します（現在位置から末尾まで）。
+        
         Args:
-            content: バイト列コンテンツ
+            content: バイト列コンテンツ、またはバイナリモードのファイルオブジェクト
         
         Returns:
             SHA256ハッシュ値
@@ -127,12 +286,41 @@ class DiffDetector:
         Raises:
             DiffDetectorError: contentが不正な場合
         """
-        if not isinstance(content, bytes):
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return hashlib.sha256(content).hexdigest()
+        
+        if isinstance(content, (io.RawIOBase, io.BufferedIOBase)):
+            return hashlib.file_digest(content, "sha256").hexdigest()
+        
+        raise DiffDetectorError(
+            f"content must be bytes or a binary file object, got {type(content).__name__}"
+        )
+    
+    def hash_file(self, path: Path) -> str:
+        """
+        ファイルのハッシュ値を計算（全体をメモリに読み込まず、ブロック単位で処理）
+        
+        _calculate_hash(path.read_bytes()) と同じ値を返します。
+        
+        Args:
+            path: ファイルパス（Path オブジェクト）
+        
+        Returns:
+            SHA256ハッシュ値
+        
+        Raises:
+            DiffDetectorError: pathが不正な場合、またはファイルを読み込めない場合
+        """
+        if not isinstance(path, Path):
             raise DiffDetectorError(
-                f"content must be bytes, got {type(content).__name__}"
+                f"path must be a Path object, got {type(path).__name__}"
             )
         
-        return hashlib.sha256(content).hexdigest()
+        try:
+            with open(path, "rb") as f:
+                return self._calculate_hash(f)
+        except OSError as e:
+            raise DiffDetectorError(f"Failed to hash file {path}: {e}") from e
     
     def detect_changes(
         self,
@@ -141,6 +329,9 @@ class DiffDetector:
         """
         ファイルの変更を検出
         
+        保存済みのハッシュ方式（hash_algorithm）が現在の方式と異なるファイルは、
+        ハッシュ値を比較できないため更新ファイルとして扱います。
+        
         Args:
             current_files: 現在のファイル情報
                 {file_id: {"name": str, "content_hash": str, "modified_time": str}}
@@ -157,24 +348,106 @@ class DiffDetector:
                 f"current_files must be a dict, got {type(current_files).__name__}"
             )
         
-        current_ids = set(current_files.keys())
-        stored_ids = set(self.metadata.keys())
+        new_files, updated_files, rehashed_count = self._compare_files(current_files)
         
-        # 新規ファイル
-        new_files = current_ids - stored_ids
+        # 削除ファイル（キーのビューで集合演算を行い、ID一覧の集合を作り直さない）
+        deleted_files = self.metadata.keys() - current_files.keys()
         
-        # 削除ファイル
-        deleted_files = stored_ids - current_ids
+        self._log_rehashed(rehashed_count)
+        return new_files, updated_files, deleted_files
+    
+    def detect_changes_stream(
+        self,
+        current_files: Iterable[Tuple[str, dict]],
+        chunk_size: int = 10_000
+    ) -> Tuple[Set[str], Set[str], Set[str]]:
+        """
+        ファイルの変更を検出（ファイル情報を逐次受け取る版）
+        
+        (file_id, ファイル情報) を chunk_size 件ずつ比較するため、全ファイルの情報を
+        辞書にまとめて保持する必要がありません。結果は detect_changes と同じです。
+        
+        Args:
+            current_files: (file_id, ファイル情報) のイテラブル（ジェネレータ可）
+            chunk_size: 一度に比較する件数
+        
+        Returns:
+            (新規ファイル, 更新ファイル, 削除ファイル) のタプル
+        
+        Raises:
+            DiffDetectorError: 引数が不正な場合
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise DiffDetectorError(f"chunk_size must be a positive int, got {chunk_size!r}")
+        
+        try:
+            items = iter(current_files)
+        except TypeError as e:
+            raise DiffDetectorError(
+                f"current_files must be iterable, got {type(current_files).__name__}"
+            ) from e
+        
+        new_files: Set[str] = set()
+        updated_files: Set[str] = set()
+        seen_ids: Set[str] = set()
+        rehashed_count = 0
+        
+        while True:
+            try:
+                chunk = dict(islice(items, chunk_size))
+            except (TypeError, ValueError) as e:
+                raise DiffDetectorError(
+                    f"current_files must yield (file_id, file_info) pairs: {e}"
+                ) from e
+            if not chunk:
+                break
+            
+            chunk_new, chunk_updated, chunk_rehashed = self._compare_files(chunk)
+            new_files |= chunk_new
+            updated_files |= chunk_updated
+            rehashed_count += chunk_rehashed
+            seen_ids.update(chunk)
+        
+        deleted_files = self.metadata.keys() - seen_ids
+        
+        self._log_rehashed(rehashed_count)
+        return new_files, updated_files, deleted_files
+    
+    def _compare_files(self, current_files: Dict[str, dict]) -> Tuple[Set[str], Set[str], int]:
+        """
+        現在のファイル情報と保存済みのメタデータを比較
+        
+        Returns:
+            (新規ファイル, 更新ファイル, ハッシュ方式が異なるため更新としたファイル数)
+        """
+        # 新規ファイル（キーのビューで集合演算を行い、ID一覧の集合を作り直さない）
+        new_files = current_files.keys() - self.metadata.keys()
         
-        # 更新ファイル（ハッシュ値が変更されたもの）
+        # 更新ファイル（ハッシュ値が変更されたもの、またはハッシュ方式が異なるもの）
+        # 共通のIDの集合は作らず、現在のファイルを1回走査して保存済みの情報を引く
         updated_files = set()
-        for file_id in current_ids & stored_ids:
-            current_hash = current_files[file_id].get("content_hash", "")
-            stored_hash = self.metadata[file_id].get("content_hash", "")
-            if current_hash != stored_hash:
+        rehashed_count = 0
+        get_stored = self.metadata.get
+        algorithm = self.HASH_ALGORITHM
+        for file_id, current in current_files.items():
+            stored = get_stored(file_id)
+            if stored is None:
+                continue
+            if stored.get("hash_algorithm") != algorithm:
+                updated_files.add(file_id)
+                rehashed_count += 1
+            elif current.get("content_hash", "") != stored.get("content_hash", ""):
                 updated_files.add(file_id)
         
-        return new_files, updated_files, deleted_files
+        return new_files, updated_files, rehashed_count
+    
+    def _log_rehashed(self, rehashed_count: int):
+        """ハッシュ方式が異なるため更新として扱ったファイル数をログに出力"""
+        if rehashed_count:
+            logger.info(
+                f"{rehashed_count} file(s) were hashed with a different algorithm "
+                f"(current: {self.HASH_ALGORITHM}); treating them as updated"
+            )
     
     def update_metadata(
         self,
@@ -188,6 +461,55 @@ class DiffDetector:
             file_id: ファイルID
             file_info: ファイル情報
         
+        Raises:
+            DiffDetectorError: 引数が不正な場合
+        """
+        self.metadata[file_id] = self._make_entry(file_id, file_info, datetime.now().isoformat())
+        self._changed_ids.add(file_id)
+        
+        # 保存
+        self._request_save()
+    
+    def update_metadata_batch(self, items: Dict[str, dict]):
+        """
+        複数ファイルのメタデータをまとめて更新（保存は1回）
+        
+        すべての引数を検証してから更新するため、不正な項目がある場合は
+        いずれのメタデータも更新されません。
+        
+        Args:
+            items: {file_id: ファイル情報}
+        
+        Raises:
+            DiffDetectorError: 引数が不正な場合
+        """
+        if not isinstance(items, dict):
+            raise DiffDetectorError(
+                f"items must be a dict, got {type(items).__name__}"
+            )
+        
+        # 同時に保存するため、更新日時は全件で共通の値を使う
+        last_updated = datetime.now().isoformat()
+        entries = {
+            file_id: self._make_entry(file_id, file_info, last_updated)
+            for file_id, file_info in items.items()
+        }
+        if not entries:
+            return
+        
+        self.metadata.update(entries)
+        self._changed_ids.update(entries)
+        self._request_save()
+    
+    def _make_entry(self, file_id: str, file_info: dict, last_updated: str) -> dict:
+        """
+        引数を検証し、保存するメタデータのエントリを作成
+        
+        Args:
+            file_id: ファイルID
+            file_info: ファイル情報
+            last_updated: 更新日時（ISO形式）
+        
         Raises:
             DiffDetectorError: 引数が不正な場合
         """
@@ -206,14 +528,19 @@ class DiffDetector:
                 f"file_info must be a dict, got {type(file_info).__name__}"
             )
         
-        # メタデータを更新
-        self.metadata[file_id] = {
+        # パストラバーサル対策（保存前に DocumentInfo と同じ規則で検査）
+        folder_path = file_info.get("folder_path")
+        for field_name, value in (("file_id", file_id), ("folder_path", folder_path)):
+            if isinstance(value, str) and ".." in value and self.PARENT_REFERENCE.search(value):
+                raise DiffDetectorError(
+                    f"Path traversal detected in {field_name}: '..' is not allowed"
+                )
+        
+        return {
             **file_info,
-            "last_updated": datetime.now().isoformat()
+            "hash_algorithm": self.HASH_ALGORITHM,
+            "last_updated": last_updated
         }
-        
-        # 保存
-        self._save_metadata()
     
     def remove_metadata(self, file_id: str):
         """
@@ -234,7 +561,8 @@ class DiffDetector:
         # ファイルが存在する場合のみ削除
         if file_id in self.metadata:
             del self.metadata[file_id]
-            self._save_metadata()
+            self._changed_ids.add(file_id)
+            self._request_save()
         else:
             logger.warning(f"Attempted to remove non-existent file_id: {file_id}")
     
@@ -0,0 +1,72 @@
+"""
+JSON読み書きモジュール
+orjson がインストールされていれば使用し、なければ標準ライブラリの json を使う
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson は任意の依存関係
+    orjson = None
+
+
+# orjson が利用可能かどうか
+HAS_ORJSON = orjson is not None
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    JSONをデコード
+
+    orjson は NaN / Infinity などの標準外の値を受け付けないため、
+    orjson でデコードできない場合は標準ライブラリで再試行します。
+
+    Args:
+        data: JSONのバイト列または文字列
+
+    Returns:
+        デコードされたオブジェクト
+
+    Raises:
+        json.JSONDecodeError: JSONとして不正な場合
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    JSONにエンコード（UTF-8のバイト列）
+
+    orjson でエンコードできない場合（非常に深いネスト、64ビットを超える整数、
+    循環参照など）は標準ライブラリで再試行し、標準ライブラリと同じ例外を送出します。
+    非ASCII文字はエスケープしません。
+
+    Args:
+        obj: エンコードするオブジェクト
+        indent: 2スペースでインデントする場合True
+
+    Returns:
+        JSONのバイト列
+
+    Raises:
+        TypeError: シリアライズできないオブジェクトを含む場合
+        ValueError: 循環参照を含む場合
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, option=option)
+        except orjson.JSONEncodeError:
+            pass
+
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
@@ -2,9 +2,55 @@
 ロギング設定モジュール
 """
 
+import atexit
 import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, Tuple
+
+
+# 設定済みのロガー名 → (ログ出力先, 出力用のリスナー)
+_configured: Dict[str, Tuple[Path, QueueListener]] = {}
+_configured_lock = threading.Lock()
+
+
+class _DailyFileHandler(logging.FileHandler):
+    """
+    日付ごとのファイル（{name}_YYYYMMDD.log）に出力するハンドラ
+    
+    日付が変わると出力先のファイルを切り替えるため、長時間動作する
+    プロセスでも作り直す必要がありません。
+    """
+    
+    def __init__(self, log_path: Path, name: str):
+        self._log_path = log_path
+        self._logger_name = name
+        self._date = datetime.now().strftime('%Y%m%d')
+        super().__init__(self._file_for(self._date), encoding='utf-8', delay=True)
+    
+    def _file_for(self, date: str) -> Path:
+        return self._log_path / f"{self._logger_name}_{date}.log"
+    
+    def emit(self, record: logging.LogRecord):
+        date = datetime.fromtimestamp(record.created).strftime('%Y%m%d')
+        if date != self._date:
+            # 次の出力時に新しい日付のファイルを開く
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            self._date = date
+            self.baseFilename = str(self._file_for(date).resolve())
+        super().emit(record)
+
+
+def _stop_listener(listener: QueueListener):
+    """リスナーを停止し、出力先のハンドラを閉じる"""
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
 
 
 def setup_logger(
@@ -15,6 +61,10 @@ def setup_logger(
     """
     ロガーをセットアップ
     
+    同じ名前・出力先で繰り返し呼び出した場合は、ハンドラを作り直さずに
+    設定済みのロガーを返します。ファイルとコンソールへの出力は
+    バックグラウンドのスレッドで行います。
+    
     Args:
         name: ロガー名
         log_path: ログファイルの保存先ディレクトリ
@@ -26,26 +76,49 @@ def setup_logger(
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, level))
     
-    # 既存のハンドラをクリア
-    logger.handlers.clear()
-    
-    # フォーマッター
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    log_path = Path(log_path).resolve()
     
-    # コンソールハンドラ
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # ファイルハンドラ
-    log_path.mkdir(parents=True, exist_ok=True)
-    log_file = log_path / f"{name}_{datetime.now().strftime('%Y%m%d')}.log"
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    with _configured_lock:
+        configured = _configured.get(name)
+        if configured is not None:
+            if configured[0] == log_path:
+                return logger
+            # 出力先が変わった場合は以前のハンドラを閉じる
+            _stop_listener(configured[1])
+        
+        # 既存のハンドラをクリア
+        logger.handlers.clear()
+        
+        # フォーマッター
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        
+        # コンソールハンドラ
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        
+        # ファイルハンドラ
+        log_path.mkdir(parents=True, exist_ok=True)
+        file_handler = _DailyFileHandler(log_path, name)
+        file_handler.setFormatter(formatter)
+        
+        # 出力はキュー経由でリスナーのスレッドが行う
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        listener = QueueListener(log_queue, console_handler, file_handler)
+        listener.start()
+        logger.addHandler(QueueHandler(log_queue))
+        
+        _configured[name] = (log_path, listener)
     
     return logger
 
+
+@atexit.register
+def _shutdown_listeners():
+    """終了時にキューに残っているログを出力"""
+    with _configured_lock:
+        for _, listener in _configured.values():
+            _stop_listener(listener)
+        _configured.clear()
@@ -0,0 +1,117 @@
+"""
+埋め込みキャッシュモジュール
+チャンクのテキストと埋め込みモデルをキーに、計算済みの埋め込みベクトルを保存して再利用する
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    埋め込みキャッシュクラス
+    
+    ドキュメントの更新時に内容が変わっていないチャンクの埋め込みを
+    再計算しないよう、SQLiteにベクトルを float32 のバイト列で保存します。
+    """
+    
+    # 1回の問い合わせで検索するキーの数（SQLiteのパラメータ数の上限に配慮）
+    QUERY_BATCH_SIZE = 500
+    
+    # 保持する埋め込みの最大件数（超えた分は古く書き込まれたものから削除）
+    MAX_ENTRIES = 50_000
+    
+    def __init__(self, db_file: Path, model: str):
+        """
+        Args:
+            db_file: キャッシュを保存するSQLiteファイル
+            model: 埋め込みモデル名（キーに含めるため、モデルを変えると別のエントリになる）
+        """
+        self.db_file = db_file
+        self.model = model
+        self._lock = threading.Lock()
+        
+        db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_file), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+    
+    def _key(self, text: str) -> str:
+        """テキストとモデル名からキーを作成"""
+        return hashlib.sha256(f"{self.model}:{text}".encode("utf-8")).hexdigest()
+    
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        テキストごとにキャッシュされた埋め込みを取得
+        
+        Args:
+            texts: チャンクのテキスト
+        
+        Returns:
+            texts と同じ順序の埋め込み（キャッシュにない場合はNone）
+        """
+        keys = [self._key(text) for text in texts]
+        found = {}
+        
+        try:
+            with self._lock:
+                for i in range(0, len(keys), self.QUERY_BATCH_SIZE):
+                    batch = keys[i:i + self.QUERY_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT hash, vector FROM embeddings WHERE hash IN ({placeholders})", batch
+                    )
+                    found.update(rows)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to read embedding cache: {e}")
+            return [None] * len(texts)
+        
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+    
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """
+        埋め込みをキャッシュに保存
+        
+        削除・変更されたチャンクの埋め込みが溜まり続けないよう、件数が MAX_ENTRIES を
+        超えた場合は古く書き込まれたものから削除します（INSERT OR REPLACE で rowid が
+        振り直されるため、rowid の順が書き込み順になります）。
+        
+        Args:
+            texts: チャンクのテキスト
+            vectors: texts と同じ順序の埋め込み
+        """
+        rows = [
+            (self._key(text), np.asarray(vector, dtype=np.float32).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)", rows
+                )
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.MAX_ENTRIES,)
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to write embedding cache: {e}")
+    
+    def close(self):
+        """データベース接続を閉じる"""
+        with self._lock:
+            self._conn.close()
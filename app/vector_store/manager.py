@@ -3,15 +3,21 @@
 LangChainとChromaDBを使用してドキュメントのベクターストアを管理
 """
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional, Dict
-import os
+from typing import Iterator, List, Optional, Dict, Tuple
+import hashlib
+import threading
+import uuid
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 
+from .embedding_cache import EmbeddingCache
 from ..data_sources.base import DocumentInfo
 from ..utils.logger import setup_logger
 from ..utils.diff_detector import DiffDetector
@@ -20,6 +26,18 @@ from ..utils.diff_detector import DiffDetector
 class VectorStoreManager:
     """ベクターストア管理クラス"""
     
+    # 並列に計算する埋め込みのバッチ数の既定値（OpenAI APIのレート制限に配慮）
+    MAX_CONCURRENT_EMBEDDINGS = 4
+    
+    # 分割結果をキャッシュするドキュメント数
+    SPLIT_CACHE_SIZE = 1024
+    
+    # 埋め込みをキャッシュする検索クエリ数
+    QUERY_EMBEDDING_CACHE_SIZE = 128
+    
+    # 一括更新中に変更するSQLiteの設定 → 一括更新中の値
+    BULK_MODE_PRAGMAS = {"synchronous": "OFF", "temp_store": "MEMORY"}
+    
     def __init__(
         self,
         vector_store_path: Path,
@@ -28,7 +46,15 @@ class VectorStoreManager:
         embedding_model: str = "text-embedding-3-small",
         chunk_size: int = 1000,
         chunk_overlap: int = 200,
-        log_path: Path = None
+        log_path: Path = None,
+        batch_size: int = 200,
+        embedding_dimensions: Optional[int] = None,
+        ingest_workers: Optional[int] = None,
+        hnsw_construction_ef: int = 40,
+        hnsw_m: int = 16,
+        hnsw_search_ef: int = 64,
+        hnsw_batch_size: int = 1000,
+        hnsw_sync_threshold: int = 10000
     ):
         """
         Args:
@@ -39,6 +65,20 @@ class VectorStoreManager:
             chunk_size: チャンクサイズ
             chunk_overlap: チャンクオーバーラップ
             log_path: ログ出力先
+            batch_size: ベクターストアへの1回の追加にまとめる最大チャンク数
+            embedding_dimensions: 埋め込みの次元数（Noneの場合はモデルの既定値）。
+                text-embedding-3 系では次元数を減らすとベクターストアのディスク・メモリ使用量が
+                比例して減ります。変更した場合はベクターストアの再構築が必要です
+            ingest_workers: 埋め込みを並列に計算するバッチ数（Noneの場合は MAX_CONCURRENT_EMBEDDINGS）
+            hnsw_construction_ef: HNSWインデックス構築時の探索幅
+            hnsw_m: HNSWインデックスの各ノードの接続数
+            hnsw_search_ef: HNSWインデックス検索時の探索幅
+            hnsw_batch_size: HNSWインデックスにまとめて反映する追加件数
+            hnsw_sync_threshold: HNSWインデックスをディスクに書き出す追加件数
+        
+        HNSWのパラメータは書き込みの多い運用向けに既定値より構築時の探索幅を下げています
+        （インデックス構築のCPU時間が減る代わりに、検索の再現率がわずかに下がります）。
+        パラメータはコレクションの作成時に適用されるため、既存のベクターストアには反映されません。
         """
         self.vector_store_path = vector_store_path
         self.metadata_path = metadata_path
@@ -46,15 +86,38 @@ class VectorStoreManager:
         self.embedding_model = embedding_model
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.ingest_workers = max(1, ingest_workers or self.MAX_CONCURRENT_EMBEDDINGS)
+        # content_hash → (チャンク, チャンクのハッシュ)
+        self._split_cache: "OrderedDict[str, Tuple[List[str], List[str]]]" = OrderedDict()
+        # 検索クエリ → 埋め込みベクトル
+        self._query_embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_embedding_lock = threading.Lock()
+        self.collection_metadata = {
+            "hnsw:construction_ef": hnsw_construction_ef,
+            "hnsw:M": hnsw_m,
+            "hnsw:search_ef": hnsw_search_ef,
+            "hnsw:batch_size": hnsw_batch_size,
+            "hnsw:sync_threshold": hnsw_sync_threshold,
+        }
         
         # ロガー設定
         if log_path is None:
             log_path = metadata_path.parent / "logs"
         self.logger = setup_logger("VectorStore", log_path)
         
-        # OpenAI Embeddings
-        os.environ["OPENAI_API_KEY"] = openai_api_key
-        self.embeddings = OpenAIEmbeddings(model=embedding_model)
+        # OpenAI Embeddings（APIキーは環境変数を経由せずに渡すため、
+        # 異なるキーを使う複数のインスタンスを作成できる）
+        self.embedding_dimensions = embedding_dimensions
+        self.embeddings = OpenAIEmbeddings(
+            model=embedding_model,
+            api_key=openai_api_key,
+            dimensions=embedding_dimensions
+        )
+        
+        # 計算済みのチャンクの埋め込み（更新時に内容が変わらないチャンクは再計算しない）
+        cache_model = embedding_model if embedding_dimensions is None else f"{embedding_model}:{embedding_dimensions}"
+        self.embedding_cache = EmbeddingCache(metadata_path / "embedding_cache.sqlite", cache_model)
         
         # テキスト分割器
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -71,47 +134,90 @@ class VectorStoreManager:
         self._load_or_create_vector_store()
     
     def _load_or_create_vector_store(self):
-        """ベクターストアを読み込みまたは作成"""
+        """
+        ベクターストアを読み込みまたは作成
+        
+        HNSWのパラメータは新規作成時のみ指定します（既存のコレクションの設定は変更しない）。
+        """
         try:
-            if self.vector_store_path.exists() and list(self.vector_store_path.glob("*")):
-                # 既存のベクターストアを読み込み
-                self.vector_store = Chroma(
-                    persist_directory=str(self.vector_store_path),
-                    embedding_function=self.embeddings
-                )
-                self.logger.info("既存のベクターストアを読み込みました")
-            else:
-                # 新規作成
-                self.vector_store = Chroma(
-                    persist_directory=str(self.vector_store_path),
-                    embedding_function=self.embeddings
-                )
-                self.logger.info("新規ベクターストアを作成しました")
+            exists = self.vector_store_path.exists() and any(self.vector_store_path.iterdir())
+            self.vector_store = Chroma(
+                persist_directory=str(self.vector_store_path),
+                embedding_function=self.embeddings,
+                collection_metadata=None if exists else self.collection_metadata
+            )
+            self.logger.info(
+                "既存のベクターストアを読み込みました" if exists else "新規ベクターストアを作成しました"
+            )
         except Exception as e:
             self.logger.error(f"ベクターストアの読み込み/作成に失敗: {e}")
             raise
     
+    def _split_text(self, doc_info: DocumentInfo) -> Tuple[List[str], List[str]]:
+        """
+        ドキュメントの内容をチャンクに分割し、各チャンクのハッシュを計算
+        
+        再試行などで同じ内容を再度処理する場合に分割し直さないよう、
+        結果を content_hash をキーにキャッシュします。
+        
+        Returns:
+            (チャンク, チャンクのハッシュ)
+        """
+        key = doc_info.content_hash
+        cached = self._split_cache.get(key)
+        if cached is not None:
+            self._split_cache.move_to_end(key)
+            return cached
+        
+        chunks = self.text_splitter.split_text(doc_info.content)
+        result = (chunks, [hashlib.sha256(chunk.encode("utf-8")).hexdigest() for chunk in chunks])
+        
+        # 内容を取得できなかったドキュメントの結果はキャッシュしない
+        if doc_info.content:
+            self._split_cache[key] = result
+            if len(self._split_cache) > self.SPLIT_CACHE_SIZE:
+                self._split_cache.popitem(last=False)
+        
+        return result
+    
     def _document_to_langchain_docs(
         self,
         doc_info: DocumentInfo
     ) -> List[Document]:
-        """DocumentInfoをLangChain Documentに変換し、チャンクに分割"""
+        """
+        DocumentInfoをLangChain Documentに変換し、チャンクに分割
+        
+        各チャンクのIDは「file_id:チャンク内容のハッシュ:同じ内容の出現番号」とし、
+        内容が変わらないチャンクは更新後も同じIDになるようにします。
+        """
         # テキストをチャンクに分割
-        chunks = self.text_splitter.split_text(doc_info.content)
+        chunks, chunk_hashes = self._split_text(doc_info)
+        
+        # チャンク間で共通のメタデータ
+        base_metadata = {
+            "source": doc_info.name,
+            "file_id": doc_info.file_id,
+            "folder_path": doc_info.folder_path,
+            "modified_time": doc_info.modified_time.isoformat(),
+            "total_chunks": len(chunks),
+            **doc_info.metadata
+        }
         
         # LangChain Documentに変換
         langchain_docs = []
-        for i, chunk in enumerate(chunks):
-            metadata = {
-                "source": doc_info.name,
-                "file_id": doc_info.file_id,
-                "folder_path": doc_info.folder_path,
-                "modified_time": doc_info.modified_time.isoformat(),
-                "chunk_index": i,
-                "total_chunks": len(chunks),
-                **doc_info.metadata
-            }
-            langchain_docs.append(Document(page_content=chunk, metadata=metadata))
+        occurrences: Dict[str, int] = {}
+        for i, (chunk, chunk_hash) in enumerate(zip(chunks, chunk_hashes)):
+            occurrence = occurrences.get(chunk_hash, 0)
+            occurrences[chunk_hash] = occurrence + 1
+            
+            metadata = base_metadata.copy()
+            # doc_info.metadata に同名のキーがある場合はそちらを優先
+            metadata.setdefault("chunk_index", i)
+            langchain_docs.append(Document(
+                page_content=chunk,
+                metadata=metadata,
+                id=f"{doc_info.file_id}:{chunk_hash}:{occurrence}"
+            ))
         
         return langchain_docs
     
@@ -129,42 +235,28 @@ class VectorStoreManager:
             self.logger.info("追加するドキュメントがありません")
             return 0
         
-        total_chunks = 0
-        
+        items = []
         for doc_info in documents:
             try:
                 # LangChain Documentに変換
                 langchain_docs = self._document_to_langchain_docs(doc_info)
-                
-                # ベクターストアに追加
-                self.vector_store.add_documents(langchain_docs)
-                total_chunks += len(langchain_docs)
-                
-                # メタデータ更新
-                self.diff_detector.update_metadata(
-                    doc_info.file_id,
-                    {
-                        "name": doc_info.name,
-                        "content_hash": doc_info.content_hash,
-                        "modified_time": doc_info.modified_time.isoformat(),
-                        "folder_path": doc_info.folder_path,
-                        "chunk_count": len(langchain_docs)
-                    }
-                )
-                
-                self.logger.info(
-                    f"追加: {doc_info.name} ({len(langchain_docs)} チャンク)"
-                )
-                
             except Exception as e:
                 self.logger.error(f"ドキュメント追加エラー ({doc_info.name}): {e}")
+                continue
+            items.append((doc_info, langchain_docs, langchain_docs))
+        
+        total_chunks = self._add_in_batches(items, "追加")
         
         self.logger.info(f"合計 {total_chunks} チャンクを追加しました")
         return total_chunks
     
     def update_documents(self, documents: List[DocumentInfo]) -> int:
         """
-        ドキュメントを更新（削除して再追加）
+        ドキュメントを更新
+        
+        前回追加したチャンクのIDが記録されている場合は、内容が変わったチャンクのみを
+        削除・追加し、変わらないチャンクはメタデータ（チャンク番号など）のみを更新します。
+        記録がない場合は全チャンクを削除して再追加します。
         
         Args:
             documents: 更新するドキュメントのリスト
@@ -176,40 +268,220 @@ class VectorStoreManager:
             self.logger.info("更新するドキュメントがありません")
             return 0
         
-        total_chunks = 0
-        
+        items = []
         for doc_info in documents:
             try:
-                # 既存のチャンクを削除
-                self.remove_document(doc_info.file_id)
-                
-                # 再追加
                 langchain_docs = self._document_to_langchain_docs(doc_info)
-                self.vector_store.add_documents(langchain_docs)
-                total_chunks += len(langchain_docs)
-                
-                # メタデータ更新
-                self.diff_detector.update_metadata(
-                    doc_info.file_id,
-                    {
-                        "name": doc_info.name,
-                        "content_hash": doc_info.content_hash,
-                        "modified_time": doc_info.modified_time.isoformat(),
-                        "folder_path": doc_info.folder_path,
-                        "chunk_count": len(langchain_docs)
-                    }
-                )
-                
-                self.logger.info(
-                    f"更新: {doc_info.name} ({len(langchain_docs)} チャンク)"
-                )
-                
+                new_chunks = self._replace_changed_chunks(doc_info.file_id, langchain_docs)
             except Exception as e:
                 self.logger.error(f"ドキュメント更新エラー ({doc_info.name}): {e}")
+                continue
+            items.append((doc_info, langchain_docs, new_chunks))
+        
+        # 内容が変わったチャンクを追加
+        total_chunks = self._add_in_batches(items, "更新")
         
         self.logger.info(f"合計 {total_chunks} チャンクを更新しました")
         return total_chunks
     
+    def _replace_changed_chunks(self, file_id: str, langchain_docs: List[Document]) -> List[Document]:
+        """
+        更新前のチャンクのうち不要になったものを削除し、残るチャンクのメタデータを更新
+        
+        Args:
+            file_id: ファイルID
+            langchain_docs: 更新後の全チャンク
+        
+        Returns:
+            追加が必要なチャンク
+        """
+        stored = self.diff_detector.get_file_info(file_id) or {}
+        old_ids = stored.get("chunk_ids")
+        if not isinstance(old_ids, list):
+            # チャンクIDの記録がない場合は全チャンクを入れ替え
+            self.remove_document(file_id)
+            return langchain_docs
+        
+        old_id_set = set(old_ids)
+        new_ids = {chunk.id for chunk in langchain_docs}
+        removed_ids = [chunk_id for chunk_id in old_id_set if chunk_id not in new_ids]
+        if removed_ids:
+            self.vector_store.delete(ids=removed_ids)
+        
+        # ベクターストアに実際に残っているチャンクのみを再利用
+        candidate_ids = [chunk.id for chunk in langchain_docs if chunk.id in old_id_set]
+        existing_ids = set(
+            self.vector_store.get(ids=candidate_ids, include=[])["ids"]
+        ) if candidate_ids else set()
+        kept = [chunk for chunk in langchain_docs if chunk.id in existing_ids]
+        if kept:
+            # 埋め込みは変わらないため、メタデータのみを更新
+            self.vector_store._collection.update(
+                ids=[chunk.id for chunk in kept],
+                metadatas=[chunk.metadata for chunk in kept],
+            )
+        
+        return [chunk for chunk in langchain_docs if chunk.id not in existing_ids]
+    
+    def _add_in_batches(
+        self,
+        items: List[Tuple[DocumentInfo, List[Document], List[Document]]],
+        action: str
+    ) -> int:
+        """
+        ドキュメントのチャンクをまとめてベクターストアに追加し、メタデータを更新
+        
+        複数ドキュメントのチャンクを最大 batch_size 件ずつ1回の追加にまとめます
+        （1つのドキュメントのチャンクは同じバッチに入れます）。埋め込みは複数の
+        バッチ分を並列に計算します。バッチの追加に失敗した場合は、そのバッチの
+        ドキュメントを1件ずつ追加し直し、失敗したドキュメントのみをスキップします。
+        
+        Args:
+            items: (ドキュメント, 全チャンク, 追加するチャンク) のリスト
+            action: ログに出力する処理名（「追加」「更新」）
+        
+        Returns:
+            追加・更新したドキュメントのチャンク数
+        """
+        batches: List[List[Tuple[DocumentInfo, List[Document], List[Document]]]] = []
+        batch: List[Tuple[DocumentInfo, List[Document], List[Document]]] = []
+        batch_chunks = 0
+        
+        for item in items:
+            new_chunks = item[2]
+            if batch and batch_chunks + len(new_chunks) > self.batch_size:
+                batches.append(batch)
+                batch, batch_chunks = [], 0
+            batch.append(item)
+            batch_chunks += len(new_chunks)
+        
+        if batch:
+            batches.append(batch)
+        
+        total_chunks = 0
+        
+        # メタデータの保存は最後にまとめて1回行う
+        with self.diff_detector.deferred_save(), \
+                ThreadPoolExecutor(max_workers=self.ingest_workers) as executor:
+            # 埋め込みは ingest_workers バッチずつ並列に計算
+            windows = [
+                batches[i:i + self.ingest_workers]
+                for i in range(0, len(batches), self.ingest_workers)
+            ]
+            for window in windows:
+                window_chunks = [
+                    [chunk for _, _, new_chunks in batch for chunk in new_chunks]
+                    for batch in window
+                ]
+                window_vectors = list(executor.map(self._embed_chunks, window_chunks))
+                
+                for batch, chunks, vectors in zip(window, window_chunks, window_vectors):
+                    total_chunks += self._add_batch(batch, chunks, vectors, action)
+        
+        return total_chunks
+    
+    def _embed_chunks(self, chunks: List[Document]) -> Optional[List[List[float]]]:
+        """
+        チャンクの埋め込みを計算（失敗した場合はNone）
+        
+        キャッシュにあるチャンクは再計算せず、キャッシュにないチャンクのみ計算します。
+        """
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = self.embedding_cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            try:
+                computed = self.embeddings.embed_documents(missing_texts)
+            except Exception as e:
+                self.logger.warning(f"埋め込みの計算に失敗: {e}")
+                return None
+            
+            self.embedding_cache.put_many(missing_texts, computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        
+        if len(missing) < len(texts):
+            self.logger.info(f"キャッシュ済みの埋め込みを使用: {len(texts) - len(missing)}/{len(texts)} チャンク")
+        
+        return vectors
+    
+    def _add_batch(
+        self,
+        batch: List[Tuple[DocumentInfo, List[Document], List[Document]]],
+        chunks: List[Document],
+        vectors: Optional[List[List[float]]],
+        action: str
+    ) -> int:
+        """
+        1バッチ分のチャンクをベクターストアに追加し、追加できたドキュメントのメタデータを更新
+        
+        Returns:
+            追加されたチャンク数
+        """
+        total_chunks = 0
+        
+        try:
+            # ベクターストアに追加（計算済みの埋め込みがあれば再計算しない）
+            if not chunks:
+                pass
+            elif vectors is None:
+                self.vector_store.add_documents(chunks)
+            else:
+                self._add_embedded_chunks(chunks, vectors)
+            added = batch
+        except Exception as e:
+            if len(batch) == 1:
+                self.logger.error(f"ドキュメント{action}エラー ({batch[0][0].name}): {e}")
+                return 0
+            
+            self.logger.warning(f"バッチの{action}に失敗したため1件ずつ処理します: {e}")
+            added = []
+            for item in batch:
+                doc_info, _, new_chunks = item
+                try:
+                    if new_chunks:
+                        self.vector_store.add_documents(new_chunks)
+                    added.append(item)
+                except Exception as e:
+                    self.logger.error(f"ドキュメント{action}エラー ({doc_info.name}): {e}")
+        
+        metadata_items = {}
+        for doc_info, langchain_docs, _ in added:
+            total_chunks += len(langchain_docs)
+            metadata_items[doc_info.file_id] = {
+                "name": doc_info.name,
+                "content_hash": doc_info.content_hash,
+                "modified_time": doc_info.modified_time.isoformat(),
+                "folder_path": doc_info.folder_path,
+                "chunk_count": len(langchain_docs),
+                "chunk_ids": [chunk.id for chunk in langchain_docs]
+            }
+            
+            self.logger.info(
+                f"{action}: {doc_info.name} ({len(langchain_docs)} チャンク)"
+            )
+        
+        # メタデータ更新（バッチ単位でまとめて反映）
+        self.diff_detector.update_metadata_batch(metadata_items)
+        
+        return total_chunks
+    
+    def _add_embedded_chunks(self, chunks: List[Document], vectors: List[List[float]]):
+        """
+        埋め込み計算済みのチャンクをベクターストアに追加
+        
+        Chroma.add_documents は追加時に埋め込みを計算するため、コレクションに直接追加します
+        （IDは Chroma.add_documents と同じくチャンクのIDを使用）。
+        """
+        self.vector_store._collection.upsert(
+            ids=[chunk.id or str(uuid.uuid4()) for chunk in chunks],
+            embeddings=vectors,
+            documents=[chunk.page_content for chunk in chunks],
+            metadatas=[chunk.metadata for chunk in chunks],
+        )
+    
     def remove_document(self, file_id: str):
         """
         ドキュメントをベクターストアから削除
@@ -221,10 +493,72 @@ class VectorStoreManager:
             # file_idでフィルタして削除
             self.vector_store.delete(where={"file_id": file_id})
             self.logger.info(f"削除: file_id={file_id}")
-            
+        
         except Exception as e:
             self.logger.error(f"ドキュメント削除エラー (file_id={file_id}): {e}")
     
+    def remove_documents(self, file_ids: List[str]) -> List[str]:
+        """
+        複数のドキュメントをベクターストアから1回の削除で削除
+        
+        Args:
+            file_ids: ファイルIDのリスト
+        
+        Returns:
+            削除したファイルID（削除に失敗した場合は空のリスト）
+        """
+        if not file_ids:
+            return []
+        
+        try:
+            self.vector_store.delete(where={"file_id": {"$in": list(file_ids)}})
+        except Exception as e:
+            self.logger.error(f"ドキュメント削除エラー ({len(file_ids)} 件): {e}")
+            return []
+        
+        for file_id in file_ids:
+            self.logger.info(f"削除: file_id={file_id}")
+        return list(file_ids)
+    
+    def _sqlite_connection(self):
+        """ベクターストアが使用するSQLiteの接続を取得（取得できない場合はNone）"""
+        try:
+            return self.vector_store._client._server._sysdb._conn_pool.connect()
+        except Exception:
+            # 内部構造の異なるバージョンのChroma
+            return None
+    
+    @contextmanager
+    def bulk_mode(self) -> Iterator[None]:
+        """
+        一括更新中はベクターストアのSQLiteのディスク同期を省略する
+        
+        コミットごとのfsyncを行わないため書き込みが速くなりますが、更新中に
+        OSの異常終了や電源断が起きるとベクターストアが破損する可能性があります
+        （その場合はデータソースから再構築します）。終了時に元の設定に戻します。
+        SQLiteの接続を取得できない場合は何もしません。
+        """
+        conn = self._sqlite_connection()
+        previous: Dict[str, object] = {}
+        if conn is not None:
+            try:
+                for name, value in self.BULK_MODE_PRAGMAS.items():
+                    previous[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+                    conn.execute(f"PRAGMA {name}={value}")
+            except Exception as e:
+                self.logger.warning(f"SQLiteの一括更新設定に失敗: {e}")
+        else:
+            self.logger.debug("SQLiteの接続を取得できないため、一括更新設定を省略します")
+        
+        try:
+            yield
+        finally:
+            for name, value in previous.items():
+                try:
+                    conn.execute(f"PRAGMA {name}={value}")
+                except Exception as e:
+                    self.logger.warning(f"SQLiteの設定の復元に失敗 ({name}): {e}")
+    
     def process_incremental_update(
         self,
         current_documents: List[DocumentInfo]
@@ -240,18 +574,16 @@ class VectorStoreManager:
         """
         self.logger.info("差分検出を開始します")
         
-        # 現在のファイル情報をマップに変換
-        current_files = {
-            doc.file_id: {
+        # 現在のファイル情報を逐次渡して差分を検出（全件の辞書を作らない）
+        current_files = (
+            (doc.file_id, {
                 "name": doc.name,
                 "content_hash": doc.content_hash,
                 "modified_time": doc.modified_time.isoformat()
-            }
+            })
             for doc in current_documents
-        }
-        
-        # 差分を検出
-        new_files, updated_files, deleted_files = self.diff_detector.detect_changes(current_files)
+        )
+        new_files, updated_files, deleted_files = self.diff_detector.detect_changes_stream(current_files)
         
         self.logger.info(
             f"差分検出結果: 新規={len(new_files)}, "
@@ -265,25 +597,26 @@ class VectorStoreManager:
             "total_chunks": 0
         }
         
-        # 新規ファイルを追加
-        new_docs = [doc for doc in current_documents if doc.file_id in new_files]
-        if new_docs:
-            chunks = self.add_documents(new_docs)
-            stats["new_count"] = len(new_docs)
-            stats["total_chunks"] += chunks
-        
-        # 更新ファイルを処理
-        updated_docs = [doc for doc in current_documents if doc.file_id in updated_files]
-        if updated_docs:
-            chunks = self.update_documents(updated_docs)
-            stats["updated_count"] = len(updated_docs)
-            stats["total_chunks"] += chunks
-        
-        # 削除ファイルを処理
-        for file_id in deleted_files:
-            self.remove_document(file_id)
-            self.diff_detector.remove_metadata(file_id)
-            stats["deleted_count"] += 1
+        # メタデータの保存は最後にまとめて1回行う（ファイルごとに全体を書き直さない）
+        with self.bulk_mode(), self.diff_detector.deferred_save():
+            # 新規ファイルを追加
+            new_docs = [doc for doc in current_documents if doc.file_id in new_files]
+            if new_docs:
+                chunks = self.add_documents(new_docs)
+                stats["new_count"] = len(new_docs)
+                stats["total_chunks"] += chunks
+            
+            # 更新ファイルを処理
+            updated_docs = [doc for doc in current_documents if doc.file_id in updated_files]
+            if updated_docs:
+                chunks = self.update_documents(updated_docs)
+                stats["updated_count"] = len(updated_docs)
+                stats["total_chunks"] += chunks
+            
+            # 削除ファイルを処理
+            for file_id in self.remove_documents(sorted(deleted_files)):
+                self.diff_detector.remove_metadata(file_id)
+                stats["deleted_count"] += 1
         
         self.logger.info(
             f"増分更新完了: 新規={stats['new_count']}, "
@@ -293,6 +626,34 @@ class VectorStoreManager:
         
         return stats
     
+    def embed_query(self, query: str) -> List[float]:
+        """
+        検索クエリの埋め込みベクトルを取得
+        
+        同じクエリの繰り返し（チャットでの再質問など）でAPIを呼び出さないよう、
+        直近のクエリの埋め込みをキャッシュします。
+        
+        Args:
+            query: 検索クエリ
+        
+        Returns:
+            埋め込みベクトル
+        """
+        with self._query_embedding_lock:
+            vector = self._query_embedding_cache.get(query)
+            if vector is not None:
+                self._query_embedding_cache.move_to_end(query)
+                return vector
+        
+        vector = self.embeddings.embed_query(query)
+        
+        with self._query_embedding_lock:
+            self._query_embedding_cache[query] = vector
+            self._query_embedding_cache.move_to_end(query)
+            while len(self._query_embedding_cache) > self.QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embedding_cache.popitem(last=False)
+        return vector
+    
     def search(
         self,
         query: str,
@@ -309,7 +670,7 @@ class VectorStoreManager:
             関連ドキュメントのリスト
         """
         try:
-            results = self.vector_store.similarity_search(query, k=k)
+            results = self.vector_store.similarity_search_by_vector(self.embed_query(query), k=k)
             return results
         except Exception as e:
             self.logger.error(f"検索エラー: {e}")
@@ -318,7 +679,8 @@ class VectorStoreManager:
     def search_with_score(
         self,
         query: str,
-        k: int = 5
+        k: int = 5,
+        embedding: Optional[List[float]] = None
     ) -> List[tuple[Document, float]]:
         """
         類似度スコア付きでドキュメントを検索
@@ -326,14 +688,18 @@ class VectorStoreManager:
         Args:
             query: 検索クエリ
             k: 取得する結果数
+            embedding: 計算済みのクエリの埋め込みベクトル（Noneの場合は embed_query で取得）
         
         Returns:
             (ドキュメント, 距離スコア)のタプルのリスト
             ※ChromaDBは距離を返すため、小さいほど類似度が高い
         """
         try:
-            results = self.vector_store.similarity_search_with_score(query, k=k)
-            return results
+            if embedding is None:
+                embedding = self.embed_query(query)
+            return self.vector_store.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k
+            )
         except Exception as e:
             self.logger.error(f"検索エラー: {e}")
             return []
@@ -354,32 +720,16 @@ class VectorStoreManager:
         """
         ベクターストアに登録されているユニークなドキュメント数を取得
         
+        取り込み時に保存されるファイル単位のメタデータから数えるため、
+        ベクターストアの全チャンクを走査しません。
+        別プロセス（更新スクリプト）による更新を反映するため、メタデータは毎回ディスクから読み直します。
+        
         Returns:
             ユニークなドキュメント数
         """
         try:
-            if self.vector_store is None:
-                return 0
-            
-            # ChromaDBからすべてのメタデータを取得
-            # get()メソッドでメタデータのみを取得（ベクターは取得しない）
-            results = self.vector_store.get()
-            
-            if not results or "metadatas" not in results:
-                return 0
-            
-            metadatas = results["metadatas"]
-            if not metadatas:
-                return 0
-            
-            # ユニークなfile_idをカウント
-            unique_file_ids = set()
-            for metadata in metadatas:
-                if metadata and "file_id" in metadata:
-                    unique_file_ids.add(metadata["file_id"])
-            
-            return len(unique_file_ids)
-            
+            return len(DiffDetector(self.metadata_path).get_all_files())
+        
         except Exception as e:
             self.logger.error(f"ドキュメント数の取得エラー: {e}")
             # エラーが発生した場合は0を返す（アプリケーションがクラッシュしないように）
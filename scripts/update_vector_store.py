@@ -1,6 +1,10 @@
 """
 ベクターストア更新スクリプト
 日次で実行して差分更新を行う
+
+更新中はベクターストアのSQLiteのディスク同期を省略して書き込みを高速化します
+（VectorStoreManager.bulk_mode）。更新中にOSの異常終了や電源断が起きた場合は、
+ベクターストアとメタデータを削除して本スクリプトを再実行し、再構築してください。
 """
 
 import sys
@@ -14,6 +18,7 @@ sys.path.insert(0, str(project_root))
 from app.config import get_settings
 from app.data_sources import GoogleDriveDataSource, SharePointDataSource
 from app.vector_store import VectorStoreManager
+from app.utils import DiffDetector
 from app.utils.logger import setup_logger
 
 
@@ -25,7 +30,7 @@ def get_data_source(settings):
             raise ValueError(
                 "Google Drive設定が不完全です。\n"
                 f"- GOOGLE_DRIVE_FOLDER_ID: {bool(settings.google_drive_folder_id)}\n"
-                f"- credentials.json: {settings.google_credentials_path.exists()}"
+                f"- credentials.json: {settings.google_credentials_available}"
             )
         
         return GoogleDriveDataSource(
@@ -85,6 +90,11 @@ def main():
         print("✓ 認証成功")
         logger.info("データソース認証成功")
         
+        # 前回取り込み時のファイル情報を渡し、更新されていないファイルのダウンロードを省略
+        data_source.set_known_documents(
+            DiffDetector(settings.metadata_path).get_all_files()
+        )
+        
         # ドキュメント一覧を取得
         print("\n[3/5] ドキュメント一覧を取得中...")
         documents = data_source.list_documents()
@@ -103,6 +113,7 @@ def main():
             metadata_path=settings.metadata_path,
             openai_api_key=settings.openai_api_key,
             embedding_model=settings.embedding_model,
+            embedding_dimensions=settings.embedding_dimensions,
             chunk_size=settings.chunk_size,
             chunk_overlap=settings.chunk_overlap,
             log_path=settings.log_path
@@ -23,45 +23,61 @@ sys.path.insert(0, str(project_root))
 # 環境変数モック
 # =====================================
 
+# テスト用の環境変数
+MOCK_ENV_VARS: Dict[str, str] = {
+    "OPENAI_API_KEY": "test-api-key-12345",
+    "DATA_SOURCE": "google_drive",
+    "GOOGLE_DRIVE_FOLDER_ID": "test-folder-id",
+    "SHAREPOINT_SITE_URL": "https://test.sharepoint.com/sites/test",
+    "SHAREPOINT_FOLDER_PATH": "Shared Documents/Test",
+    "SHAREPOINT_CLIENT_ID": "test-client-id",
+    "SHAREPOINT_CLIENT_SECRET": "test-client-secret",
+    "SHAREPOINT_TENANT_ID": "test-tenant-id",
+    "VECTOR_STORE_PATH": "./test_data/vector_store",
+    "METADATA_PATH": "./test_data/metadata",
+    "EMBEDDING_MODEL": "text-embedding-3-small",
+    "CHAT_MODEL": "gpt-4o-mini",
+    "CHUNK_SIZE": "1000",
+    "CHUNK_OVERLAP": "200",
+    "TOP_K_RESULTS": "5",
+    "LOG_LEVEL": "DEBUG",
+    "LOG_PATH": "./test_logs",
+}
+
+
+def pytest_configure(config):
+    """
+    テストセッションの開始時に一度だけ環境変数をセットアップ
+    
+    各テストでの変更は monkeypatch 経由で行うため、テスト終了時に
+    ここで設定した値に戻ります。
+    .env は最初の Settings 生成時に上書きで反映されるため、先に読み込ませてから
+    モック値を設定します（以降の Settings 生成では同じ .env は再反映されません）。
+    """
+    from app.config.settings import _ensure_env_loaded
+    
+    _ensure_env_loaded()
+    os.environ.update(MOCK_ENV_VARS)
+
+
 @pytest.fixture(scope="session")
 def mock_env_vars() -> Dict[str, str]:
     """テスト用の環境変数を返す"""
-    return {
-        "OPENAI_API_KEY": "test-api-key-12345",
-        "DATA_SOURCE": "google_drive",
-        "GOOGLE_DRIVE_FOLDER_ID": "test-folder-id",
-        "SHAREPOINT_SITE_URL": "https://test.sharepoint.com/sites/test",
-        "SHAREPOINT_FOLDER_PATH": "Shared Documents/Test",
-        "SHAREPOINT_CLIENT_ID": "test-client-id",
-        "SHAREPOINT_CLIENT_SECRET": "test-client-secret",
-        "SHAREPOINT_TENANT_ID": "test-tenant-id",
-        "VECTOR_STORE_PATH": "./test_data/vector_store",
-        "METADATA_PATH": "./test_data/metadata",
-        "EMBEDDING_MODEL": "text-embedding-3-small",
-        "CHAT_MODEL": "gpt-4o-mini",
-        "CHUNK_SIZE": "1000",
-        "CHUNK_OVERLAP": "200",
-        "TOP_K_RESULTS": "5",
-        "LOG_LEVEL": "DEBUG",
-        "LOG_PATH": "./test_logs",
-    }
-
-
-@pytest.fixture(autouse=True)
-def setup_test_env(mock_env_vars: Dict[str, str], monkeypatch) -> None:
-    """すべてのテストで自動的に環境変数をセットアップ"""
-    for key, value in mock_env_vars.items():
-        monkeypatch.setenv(key, value)
+    return dict(MOCK_ENV_VARS)
 
 
 # =====================================
 # 一時ディレクトリとファイル
 # =====================================
 
+# 一時ディレクトリの作成先（Linuxではメモリ上の /dev/shm を使いディスクI/Oを避ける）
+_TEMP_DIR_BASE = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
 @pytest.fixture
 def temp_dir() -> Generator[Path, None, None]:
     """一時ディレクトリを作成し、テスト後に削除"""
-    with tempfile.TemporaryDirectory() as tmp_dir:
+    with tempfile.TemporaryDirectory(dir=_TEMP_DIR_BASE) as tmp_dir:
         yield Path(tmp_dir)
 
 
@@ -17,15 +17,19 @@ from app.data_sources.base import DocumentInfo
 from app.utils.diff_detector import DiffDetector
 
 
+# 大量データのテストで全件が共有する不変部分（ループ内で毎回生成しない）
+_BIG_CONTENT = "A" * 10000  # 10KB コンテンツ
+_NAME_SUFFIX = ".txt" * 50  # 長いファイル名
+
+
 class TestSystemIntegrationAttacks:
     """システム統合への攻撃"""
     
     @pytest.mark.adversarial
     @pytest.mark.integration
     @pytest.mark.slow
-    def test_full_workflow_with_corrupted_data(self, temp_dir, monkeypatch):
+    def test_full_workflow_with_corrupted_data(self, temp_dir):
         """❌ 全ワークフローで壊れたデータを流し込む"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         
         # 設定を初期化
         settings = Settings()
@@ -52,27 +56,27 @@ class TestSystemIntegrationAttacks:
     @pytest.mark.adversarial
     @pytest.mark.integration
     @pytest.mark.resource_attack
+    @pytest.mark.slow
     def test_memory_exhaustion_attack(self, temp_dir, monkeypatch):
         """❌ メモリ枯渇攻撃"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("CHUNK_SIZE", "10000000")  # 10MB チャンク
         
         settings = Settings()
         
-        # 10万ファイルの巨大なデータセット
-        massive_data = {}
-        for i in range(100000):
-            massive_data[f"file_{i}"] = {
-                "content_hash": f"hash_{i}" * 100,  # 長いハッシュ
-                "name": f"document_{i}.txt" * 50,  # 長いファイル名
-                "content": "A" * 10000,  # 10KB コンテンツ
-            }
+        # 10万ファイルの巨大なデータセット（全件を保持せず逐次生成）
+        def massive_data():
+            for i in range(100000):
+                yield f"file_{i}", {
+                    "content_hash": f"hash_{i}" * 100,  # 長いハッシュ
+                    "name": f"document_{i}{_NAME_SUFFIX}",  # 長いファイル名
+                    "content": _BIG_CONTENT,  # 10KB コンテンツ
+                }
         
         detector = DiffDetector(temp_dir)
         
         # メモリ使用量が爆発する可能性
         try:
-            new, updated, deleted = detector.detect_changes(massive_data)
+            new, updated, deleted = detector.detect_changes_stream(massive_data())
             assert len(new) == 100000, "大量のファイルを処理できた"
         except MemoryError:
             pytest.fail("メモリ不足で失敗！リソース管理が甘い！")
@@ -115,9 +119,8 @@ class TestSystemIntegrationAttacks:
     @pytest.mark.adversarial
     @pytest.mark.integration
     @pytest.mark.boundary
-    def test_race_condition_simulation(self, temp_dir, monkeypatch):
+    def test_race_condition_simulation(self, temp_dir):
         """❌ 競合状態のシミュレーション"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         
         detector1 = DiffDetector(temp_dir)
         detector2 = DiffDetector(temp_dir)
@@ -162,10 +165,9 @@ class TestConfigurationCombinationAttacks:
         (-100, 50),  # 負のチャンクサイズ
         (100, -50),  # 負のオーバーラップ
         (1, 0),  # 極端に小さいチャンク
-    ])
+    ], ids=["overlap_exceeds_size", "both_zero", "negative_size", "negative_overlap", "tiny_chunk"])
     def test_invalid_chunk_configurations(self, chunk_size, chunk_overlap, monkeypatch):
         """❌ 不正なチャンク設定の組み合わせ"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("CHUNK_SIZE", str(chunk_size))
         monkeypatch.setenv("CHUNK_OVERLAP", str(chunk_overlap))
         
@@ -184,7 +186,6 @@ class TestConfigurationCombinationAttacks:
     def test_all_environment_variables_empty(self, monkeypatch):
         """❌ すべての環境変数が空の場合"""
         # OpenAI API キー以外を全て空に
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("DATA_SOURCE", "")
         monkeypatch.setenv("GOOGLE_DRIVE_FOLDER_ID", "")
         monkeypatch.setenv("CHUNK_SIZE", "")
@@ -205,21 +206,22 @@ class TestBoundaryValueCombinations:
         {"\n": "\n"},  # 両方改行
         {"\x00": "\x00"},  # Null バイト
         {"🔥": "💀"},  # 絵文字
-    ])
+    ], ids=["empty", "space", "newline", "null_byte", "emoji"])
     def test_extreme_boundary_values_in_metadata(self, temp_dir, input_data):
         """❌ 極端な境界値をメタデータに保存"""
         detector = DiffDetector(temp_dir)
         
-        for key, value in input_data.items():
-            detector.update_metadata(key, {"content_hash": value})
+        # まとめて更新（保存は1回）
+        detector.update_metadata_batch(
+            {key: {"content_hash": value} for key, value in input_data.items()}
+        )
         
         # 再読み込み
         detector2 = DiffDetector(temp_dir)
         
         # すべてのキーが保存されているか確認
-        for key in input_data.keys():
-            stored = detector2.get_file_info(key)
-            assert stored is not None, f"キー '{repr(key)}' が保存されなかった"
+        missing = [key for key in input_data if detector2.get_file_info(key) is None]
+        assert not missing, f"キー {missing!r} が保存されなかった"
 
 
 class TestErrorPropagation:
@@ -243,7 +245,7 @@ class TestErrorPropagation:
     
     @pytest.mark.adversarial
     @pytest.mark.integration
-    def test_permission_error_handling(self, temp_dir, monkeypatch):
+    def test_permission_error_handling(self, temp_dir):
         """❌ パーミッションエラーの処理"""
         
         # ファイルを読み込み専用にする
@@ -11,7 +11,7 @@ from pathlib import Path
 from unittest.mock import patch, MagicMock
 
 # テスト対象のインポート
-from app.config.settings import Settings, get_settings
+from app.config.settings import ConfigurationError, Settings, get_settings, reset_settings
 
 
 class TestSettingsInitializationAttacks:
@@ -58,7 +58,6 @@ class TestSettingsInitializationAttacks:
     @pytest.mark.type_attack
     def test_chunk_size_with_non_numeric_string_should_fail(self, monkeypatch):
         """❌ 数値じゃない文字列を CHUNK_SIZE に入れたら？"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("CHUNK_SIZE", "not_a_number")
         
         with pytest.raises(ValueError):
@@ -68,7 +67,6 @@ class TestSettingsInitializationAttacks:
     @pytest.mark.type_attack
     def test_chunk_size_negative_value_should_fail(self, monkeypatch):
         """❌ 負の CHUNK_SIZE を許すな！"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("CHUNK_SIZE", "-1000")
         
         settings = Settings()
@@ -80,7 +78,6 @@ class TestSettingsInitializationAttacks:
     @pytest.mark.type_attack
     def test_chunk_size_zero_should_fail(self, monkeypatch):
         """❌ チャンクサイズ0を許すな！"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("CHUNK_SIZE", "0")
         
         settings = Settings()
@@ -91,7 +88,6 @@ class TestSettingsInitializationAttacks:
     @pytest.mark.boundary
     def test_chunk_overlap_greater_than_chunk_size(self, monkeypatch):
         """❌ オーバーラップがチャンクサイズより大きい場合は？"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("CHUNK_SIZE", "100")
         monkeypatch.setenv("CHUNK_OVERLAP", "200")
         
@@ -104,7 +100,6 @@ class TestSettingsInitializationAttacks:
     @pytest.mark.type_attack
     def test_top_k_results_negative_value(self, monkeypatch):
         """❌ 負の TOP_K_RESULTS を許すな！"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("TOP_K_RESULTS", "-5")
         
         settings = Settings()
@@ -115,7 +110,6 @@ class TestSettingsInitializationAttacks:
     @pytest.mark.type_attack
     def test_invalid_data_source_type(self, monkeypatch):
         """❌ 存在しないデータソースタイプ"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("DATA_SOURCE", "dropbox")  # サポート外
         
         settings = Settings()
@@ -127,7 +121,6 @@ class TestSettingsInitializationAttacks:
     @pytest.mark.security
     def test_path_traversal_in_log_path(self, monkeypatch):
         """❌ ログパスにパストラバーサル攻撃"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("LOG_PATH", "../../etc/passwd")
         
         settings = Settings()
@@ -144,7 +137,6 @@ class TestSettingsValidationAttacks:
     @pytest.mark.boundary
     def test_validate_google_drive_with_empty_folder_id(self, monkeypatch):
         """❌ 空のフォルダIDで検証を通すな！"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("DATA_SOURCE", "google_drive")
         monkeypatch.setenv("GOOGLE_DRIVE_FOLDER_ID", "")
         
@@ -156,7 +148,6 @@ class TestSettingsValidationAttacks:
     @pytest.mark.boundary
     def test_validate_google_drive_without_credentials_file(self, monkeypatch, tmp_path):
         """❌ credentials.json が無い場合の検証"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("DATA_SOURCE", "google_drive")
         monkeypatch.setenv("GOOGLE_DRIVE_FOLDER_ID", "test-folder-id")
         
@@ -171,7 +162,6 @@ class TestSettingsValidationAttacks:
     @pytest.mark.boundary
     def test_validate_sharepoint_with_partial_config(self, monkeypatch):
         """❌ SharePoint 設定が部分的にしか無い場合"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("DATA_SOURCE", "sharepoint")
         monkeypatch.setenv("SHAREPOINT_SITE_URL", "https://test.sharepoint.com")
         # 他のフィールドは設定しない
@@ -184,7 +174,6 @@ class TestSettingsValidationAttacks:
     @pytest.mark.boundary
     def test_validate_sharepoint_with_whitespace_only_fields(self, monkeypatch):
         """❌ スペースだけのフィールドを受け入れるな！"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("DATA_SOURCE", "sharepoint")
         monkeypatch.setenv("SHAREPOINT_SITE_URL", "   ")
         monkeypatch.setenv("SHAREPOINT_FOLDER_PATH", "\t\n")
@@ -206,13 +195,11 @@ class TestSettingsSingletonAttacks:
     """シングルトンパターンへの攻撃"""
     
     @pytest.mark.adversarial
-    def test_singleton_returns_same_instance(self, monkeypatch):
+    def test_singleton_returns_same_instance(self):
         """❌ シングルトンが本当に同じインスタンスを返すか？"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         
-        # グローバル変数をリセット
-        import app.config.settings as settings_module
-        settings_module._settings_instance = None
+        # シングルトンをリセット
+        reset_settings()
         
         instance1 = get_settings()
         instance2 = get_settings()
@@ -225,9 +212,8 @@ class TestSettingsSingletonAttacks:
         """❌ シングルトンの状態汚染テスト"""
         monkeypatch.setenv("OPENAI_API_KEY", "test-key-1")
         
-        # グローバル変数をリセット
-        import app.config.settings as settings_module
-        settings_module._settings_instance = None
+        # シングルトンをリセット
+        reset_settings()
         
         settings1 = get_settings()
         original_key = settings1.openai_api_key
@@ -252,7 +238,6 @@ class TestSettingsResourceAttacks:
     @pytest.mark.resource_attack
     def test_extremely_large_chunk_size(self, monkeypatch):
         """❌ 極端に大きなチャンクサイズでメモリを圧迫"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("CHUNK_SIZE", str(10**9))  # 1GB
         
         settings = Settings()
@@ -264,13 +249,22 @@ class TestSettingsResourceAttacks:
     @pytest.mark.resource_attack
     def test_extremely_large_top_k_results(self, monkeypatch):
         """❌ 極端に大きな TOP_K でAPIコストを爆増させる"""
-        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
         monkeypatch.setenv("TOP_K_RESULTS", str(10**6))
         
         settings = Settings()
         # APIコストが爆発する
         assert settings.top_k_results < 1000, \
             "TOP_K が大きすぎる！APIコストとレスポンス時間が爆発する！"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_embedding_dimensions_out_of_range_should_fail(self, monkeypatch):
+        """❌ モデルが返せない次元数の EMBEDDING_DIMENSIONS を許すな！"""
+        monkeypatch.setenv("EMBEDDING_DIMENSIONS", str(10**6))
+        
+        settings = Settings()
+        with pytest.raises(ConfigurationError):
+            settings.embedding_dimensions
 
 
 # =====================================
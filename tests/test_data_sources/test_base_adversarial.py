@@ -5,11 +5,15 @@
 """
 
 import pytest
-from datetime import datetime
+from dataclasses import FrozenInstanceError, replace
+from datetime import datetime, timezone
 from typing import Dict
 from unittest.mock import Mock, patch
 
-from app.data_sources.base import DocumentInfo, DataSourceBase
+from app.data_sources.base import (
+    ContentCache, DocumentInfo, DataSourceBase, DocumentValidationError, EMPTY_CONTENT_HASH
+)
+from app.utils.diff_detector import DiffDetector
 
 
 class TestDocumentInfoAttacks:
@@ -146,6 +150,43 @@ class TestDocumentInfoAttacks:
         # リストのまま保存される
         assert isinstance(doc.metadata, list), \
             "metadata の型チェックが無い！辞書を期待しているのに！"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.security
+    def test_document_info_cannot_be_modified_after_validation(self):
+        """✅ 検証後に内容を書き換えてハッシュと不整合にできない"""
+        doc = DocumentInfo(
+            file_id="test",
+            name="test.txt",
+            content="content",
+            modified_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            folder_path="/test"
+        )
+        
+        with pytest.raises(FrozenInstanceError):
+            doc.content = "tampered"
+        
+        # 変更する場合は replace() で作り直すため、検証もやり直される
+        with pytest.raises(DocumentValidationError):
+            replace(doc, folder_path="../secret")
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_document_info_has_no_instance_dict(self):
+        """✅ 大量に生成しても1件ごとの __dict__ を持たない"""
+        doc = DocumentInfo(
+            file_id="test",
+            name="test.txt",
+            content="content",
+            modified_time=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            folder_path="/test"
+        )
+        
+        assert not hasattr(doc, "__dict__"), "__slots__ 化されていない"
+        assert set(DocumentInfo.__slots__) == {
+            "file_id", "name", "content", "modified_time",
+            "folder_path", "content_hash", "metadata",
+        }
 
 
 class TestDataSourceBaseAttacks:
@@ -227,6 +268,72 @@ class TestDataSourceBaseAttacks:
         # 再帰的には取得しない！メソッド名が嘘！
         docs = ds.get_all_documents_recursive("/test")
         assert len(docs) == 1, "再帰的に取得していない！名前詐欺！"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.boundary
+    def test_unchanged_content_hash_requires_same_time_and_algorithm(self):
+        """✅ 更新日時とハッシュ方式が一致する場合のみダウンロードを省略できる"""
+        
+        class MockDataSource(DataSourceBase):
+            def authenticate(self) -> bool:
+                return True
+            
+            def list_documents(self, folder_path=None):
+                return []
+            
+            def get_document_content(self, file_id: str) -> str:
+                return ""
+            
+            def get_document_info(self, file_id: str):
+                return None
+        
+        modified = datetime(2024, 1, 1)
+        ds = MockDataSource()
+        assert ds._unchanged_content_hash("f1", modified) is None, "未設定なのに省略された"
+        
+        ds.set_known_documents({
+            "f1": {"content_hash": "h1", "modified_time": modified.isoformat(), "hash_algorithm": "sha256"},
+            "f2": {"content_hash": "h2", "modified_time": modified.isoformat()},  # 方式の記録が無い
+        })
+        
+        assert ds._unchanged_content_hash("f1", modified) == "h1"
+        assert ds._unchanged_content_hash("f1", datetime(2024, 1, 2)) is None, \
+            "更新されたファイルのダウンロードが省略された！"
+        assert ds._unchanged_content_hash("f2", modified) is None, \
+            "ハッシュ方式が不明なのにダウンロードが省略された！"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.boundary
+    def test_failed_download_is_retried_on_next_run(self, temp_dir):
+        """✅ 取得に失敗した（空のハッシュで記録された）ファイルは次回も取得し直す"""
+        
+        class MockDataSource(DataSourceBase):
+            def authenticate(self) -> bool:
+                return True
+            
+            def list_documents(self, folder_path=None):
+                return []
+            
+            def get_document_content(self, file_id: str) -> str:
+                return ""
+            
+            def get_document_info(self, file_id: str):
+                return None
+        
+        modified = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        
+        # 1回目：ダウンロードに失敗し、空の内容のまま取り込まれた
+        detector = DiffDetector(temp_dir)
+        detector.update_metadata("f1", {
+            "content_hash": EMPTY_CONTENT_HASH,
+            "modified_time": modified.isoformat(),
+        })
+        
+        # 2回目：更新日時は変わっていないが、前回の空のハッシュは再利用しない
+        ds = MockDataSource()
+        ds.set_known_documents(DiffDetector(temp_dir).get_all_files())
+        assert ds._unchanged_content_hash("f1", modified) is None, \
+            "取得に失敗したファイルが二度と取得されない！"
 
 
 class TestDocumentInfoHashingAttacks:
@@ -289,6 +396,34 @@ class TestDocumentInfoHashingAttacks:
             "ハッシュ衝突が発生すると差分検出が機能しない！"
 
 
+
+class TestContentCacheAttacks:
+    """ContentCache（ダウンロード内容のキャッシュ）への攻撃"""
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_content_cache_is_bounded(self):
+        """✅ 上限を超えると最も長く使われていないエントリが破棄される"""
+        cache = ContentCache(max_entries=2)
+        cache.put(("a", "t1"), ("A", "ha"))
+        cache.put(("b", "t1"), ("B", "hb"))
+        cache.get(("a", "t1"))  # a を最近使用したことにする
+        cache.put(("c", "t1"), ("C", "hc"))
+        
+        assert len(cache) == 2, "キャッシュが上限を超えて増え続ける"
+        assert cache.get(("b", "t1")) is None, "最も古いエントリが破棄されていない"
+        assert cache.get(("a", "t1")) == ("A", "ha")
+    
+    @pytest.mark.adversarial
+    @pytest.mark.boundary
+    def test_content_cache_misses_on_new_modified_time(self):
+        """✅ 更新日時が変わると古い内容は返されない"""
+        cache = ContentCache()
+        cache.put(("file1", "2024-01-01T00:00:00Z"), ("old", "h1"))
+        
+        assert cache.get(("file1", "2024-01-02T00:00:00Z")) is None, \
+            "更新後も古い内容が返された！"
+
 # =====================================
 # 批判的フィードバック
 # =====================================
@@ -0,0 +1 @@
+# RAG tests package
@@ -0,0 +1,83 @@
+"""
+🔥 SemanticCache（意味的回答キャッシュ）への意地悪な攻撃的テスト
+
+類似度のしきい値・参照内容の不一致・次元数の変化・件数上限・永続化を突く。
+"""
+
+import numpy as np
+import pytest
+
+from app.rag.semantic_cache import SemanticCache
+
+
+class TestSemanticCacheAttacks:
+    """SemanticCache への攻撃"""
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_answers_persist_across_instances(self, temp_dir):
+        """✅ 保存した回答を別のインスタンスで読み込める"""
+        cache_file = temp_dir / "semantic_cache.npz"
+        SemanticCache(cache_file).add("質問", [1.0, 0.0], "ctx", "回答")
+        
+        reloaded = SemanticCache(cache_file)
+        assert len(reloaded) == 1
+        assert reloaded.lookup([1.0, 0.0], "ctx") == "回答"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.security
+    def test_context_signature_mismatch_is_a_miss(self, temp_dir):
+        """✅ 参照内容が異なれば同じ質問でも回答を返さない"""
+        cache = SemanticCache()
+        cache.add("質問", [1.0, 0.0], "ctx_old", "古い回答")
+        
+        assert cache.lookup([1.0, 0.0], "ctx_new") is None, "参照内容が違うのに回答を返した！"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.boundary
+    def test_threshold_boundary(self):
+        """✅ 類似度がしきい値ちょうどなら一致、わずかに下回れば不一致"""
+        stored, query = [1.0, 0.0], [1.0, 1.0]
+        similarity = float(SemanticCache._normalize(stored) @ SemanticCache._normalize(query))
+        
+        at_threshold = SemanticCache(threshold=similarity)
+        at_threshold.add("質問", stored, "ctx", "回答")
+        assert at_threshold.lookup(query, "ctx") == "回答"
+        
+        above_threshold = SemanticCache(threshold=float(np.nextafter(np.float32(similarity), np.float32(1))))
+        above_threshold.add("質問", stored, "ctx", "回答")
+        assert above_threshold.lookup(query, "ctx") is None
+    
+    @pytest.mark.adversarial
+    @pytest.mark.type_attack
+    def test_dimension_change_clears_cache(self):
+        """✅ 埋め込みの次元数が変わると古いエントリを破棄"""
+        cache = SemanticCache()
+        cache.add("質問1", [1.0, 0.0], "ctx", "回答1")
+        cache.add("質問2", [1.0, 0.0, 0.0], "ctx", "回答2")
+        
+        assert len(cache) == 1
+        assert cache.lookup([1.0, 0.0], "ctx") is None, "次元数の違うベクトルで一致した！"
+        assert cache.lookup([1.0, 0.0, 0.0], "ctx") == "回答2"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_oldest_entries_are_evicted(self):
+        """✅ 上限を超えると古いものから破棄される"""
+        cache = SemanticCache(max_entries=2)
+        cache.add("質問1", [1.0, 0.0, 0.0], "ctx", "回答1")
+        cache.add("質問2", [0.0, 1.0, 0.0], "ctx", "回答2")
+        cache.add("質問3", [0.0, 0.0, 1.0], "ctx", "回答3")
+        
+        assert len(cache) == 2
+        assert cache.lookup([1.0, 0.0, 0.0], "ctx") is None, "上限を超えても破棄されない！"
+        assert cache.lookup([0.0, 0.0, 1.0], "ctx") == "回答3"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.boundary
+    def test_empty_answer_is_not_cached(self, temp_dir):
+        """✅ 空の回答はキャッシュ・保存しない"""
+        cache_file = temp_dir / "semantic_cache.npz"
+        SemanticCache(cache_file).add("質問", [1.0, 0.0], "ctx", "")
+        
+        assert SemanticCache(cache_file).lookup([1.0, 0.0], "ctx") is None
@@ -5,13 +5,14 @@
 """
 
 import pytest
+import io
 import json
 import tempfile
 from pathlib import Path
 from typing import Dict
 from unittest.mock import patch, mock_open, MagicMock
 
-from app.utils.diff_detector import DiffDetector
+from app.utils.diff_detector import DiffDetector, DiffDetectorError
 
 
 class TestDiffDetectorInitializationAttacks:
@@ -78,6 +79,21 @@ class TestDiffDetectorInitializationAttacks:
         # 型が違うので、後で dict.keys() などでクラッシュする可能性
         assert isinstance(detector.metadata, dict), \
             "型が違うメタデータを読み込んだ！後でクラッシュする！"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_metadata_is_loaded_on_first_access(self, temp_dir):
+        """✅ メタデータは初回アクセスまで読み込まない"""
+        (temp_dir / "file_metadata.json").write_text('{"file1": {"content_hash": "a"}}')
+        
+        with patch.object(DiffDetector, "_load_metadata", autospec=True,
+                          side_effect=DiffDetector._load_metadata) as load:
+            detector = DiffDetector(temp_dir)
+            assert load.call_count == 0, "生成時に読み込んだ"
+            
+            assert "file1" in detector.metadata
+            assert "file1" in detector.metadata
+            assert load.call_count == 1, "アクセスのたびに読み込んだ"
 
 
 class TestCalculateHashAttacks:
@@ -124,6 +140,21 @@ class TestCalculateHashAttacks:
         hash_value = detector._calculate_hash(b"")
         # 空データでもハッシュは計算される
         assert len(hash_value) == 64, "空データのハッシュが計算できなかった"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.boundary
+    def test_hash_file_matches_calculate_hash(self, temp_dir):
+        """✅ ファイルを直接ハッシュ化しても、バイト列のハッシュと一致する（空ファイルを含む）"""
+        detector = DiffDetector(temp_dir)
+        
+        for name, content in [("empty.bin", b""), ("large.bin", b"x" * (3 * 1024 * 1024 + 7))]:
+            path = temp_dir / name
+            path.write_bytes(content)
+            assert detector.hash_file(path) == detector._calculate_hash(content)
+            assert detector._calculate_hash(io.BytesIO(content)) == detector._calculate_hash(content)
+        
+        with pytest.raises(DiffDetectorError):
+            detector.hash_file(temp_dir / "missing.bin")
 
 
 class TestDetectChangesAttacks:
@@ -208,6 +239,23 @@ class TestDetectChangesAttacks:
         new, updated, deleted = detector.detect_changes(current_files)
         # エラーにはならないが、期待通りの動作はしない
     
+    @pytest.mark.adversarial
+    @pytest.mark.boundary
+    def test_detect_changes_with_different_hash_algorithm(self, temp_dir):
+        """✅ ハッシュ方式が異なる（または記録が無い）エントリは更新と判定される"""
+        detector = DiffDetector(temp_dir)
+        detector.update_metadata("current", {"content_hash": "abc"})
+        detector.metadata["legacy"] = {"content_hash": "abc"}  # 方式の記録が無い
+        
+        current_files = {
+            "current": {"content_hash": "abc"},
+            "legacy": {"content_hash": "abc"},
+        }
+        
+        new, updated, deleted = detector.detect_changes(current_files)
+        
+        assert updated == {"legacy"}, "ハッシュ方式の違いが検出されていない"
+    
     @pytest.mark.adversarial
     @pytest.mark.resource_attack
     def test_detect_changes_with_huge_number_of_files(self, temp_dir):
@@ -293,6 +341,26 @@ class TestUpdateMetadataAttacks:
         # JSONとして保存されるので、プロトタイプ汚染は起きないが...
         assert "file1" in detector.metadata, "悪意のあるキーでも保存される"
     
+    @pytest.mark.adversarial
+    @pytest.mark.security
+    @pytest.mark.parametrize("file_id,folder_path", [
+        ("../../etc/passwd", "docs"),
+        ("file1", "../../etc"),
+        ("file1", "docs\\..\\..\\secret"),
+    ])
+    def test_update_metadata_rejects_path_traversal(self, temp_dir, file_id, folder_path):
+        """✅ パストラバーサルを含む file_id / folder_path は保存前に拒否"""
+        detector = DiffDetector(temp_dir)
+        
+        with pytest.raises(DiffDetectorError, match="Path traversal"):
+            detector.update_metadata(file_id, {"folder_path": folder_path})
+        
+        assert file_id not in detector.metadata
+        
+        # ".." を含むだけの名前（日本語を含む）は許可
+        detector.update_metadata("my..project", {"folder_path": "議事録/my..notes"})
+        assert "my..project" in detector.metadata
+    
     @pytest.mark.adversarial
     @pytest.mark.resource_attack
     def test_update_metadata_overwrites_without_backup(self, temp_dir):
@@ -308,11 +376,73 @@ class TestUpdateMetadataAttacks:
         # important_data が消えた！
         assert "important_data" not in detector.metadata["file1"], \
             "データが上書きで消えた！バックアップ機構が無い！"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_deferred_save_writes_metadata_once(self, temp_dir):
+        """✅ deferred_save() の中の更新・削除は終了時に1回だけ保存される"""
+        detector = DiffDetector(temp_dir)
+        detector.update_metadata("old", {"content_hash": "x"})
+        
+        with patch.object(detector, "_save_metadata", wraps=detector._save_metadata) as save:
+            with detector.deferred_save():
+                for i in range(100):
+                    detector.update_metadata(f"file{i}", {"content_hash": str(i)})
+                detector.remove_metadata("old")
+                assert save.call_count == 0, "ブロック内で保存されている"
+            
+            assert save.call_count == 1, "保存がまとめられていない"
+        
+        reloaded = DiffDetector(temp_dir)
+        assert len(reloaded.metadata) == 100 and "old" not in reloaded.metadata
+    
+    @pytest.mark.adversarial
+    @pytest.mark.type_attack
+    def test_update_metadata_batch_rejects_invalid_item_atomically(self, temp_dir):
+        """✅ 不正な項目を含むバッチ更新は何も更新しない"""
+        detector = DiffDetector(temp_dir)
+        
+        with pytest.raises(DiffDetectorError):
+            detector.update_metadata_batch({"file1": {"content_hash": "a"}, "": {}})
+        
+        assert "file1" not in detector.metadata, "不正なバッチの一部が反映された"
+    
+    @pytest.mark.adversarial
+    @pytest.mark.integration
+    def test_concurrent_instances_do_not_lose_updates(self, temp_dir):
+        """✅ 別インスタンスが保存した他のファイルの更新・削除を上書きで失わない"""
+        detector1 = DiffDetector(temp_dir)
+        detector2 = DiffDetector(temp_dir)
+        
+        detector1.update_metadata("file1", {"content_hash": "a"})
+        detector2.update_metadata("file2", {"content_hash": "b"})
+        detector1.remove_metadata("file1")
+        detector2.update_metadata("file3", {"content_hash": "c"})
+        
+        reloaded = DiffDetector(temp_dir)
+        assert sorted(reloaded.metadata) == ["file2", "file3"], \
+            "別インスタンスの変更が失われた！"
 
 
 class TestSaveMetadataAttacks:
     """メタデータ保存への攻撃"""
     
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_unchanged_metadata_is_not_rewritten(self, temp_dir):
+        """✅ 内容が変わっていなければ保存してもファイルを書き換えない"""
+        detector = DiffDetector(temp_dir)
+        detector.update_metadata("file1", {"content_hash": "hash1"})
+        inode = detector.metadata_file.stat().st_ino
+        
+        detector._save_metadata()
+        assert detector.metadata_file.stat().st_ino == inode, "同じ内容を書き直した"
+        
+        # 内容が変われば書き込む
+        detector.metadata["file1"]["content_hash"] = "hash2"
+        detector._save_metadata()
+        assert detector.metadata_file.stat().st_ino != inode
+    
     @pytest.mark.adversarial
     @pytest.mark.resource_attack
     def test_save_metadata_with_extremely_deep_nesting(self, temp_dir):
@@ -0,0 +1,77 @@
+"""
+🔥 EmbeddingCache（埋め込みキャッシュ）への意地悪な攻撃的テスト
+
+SQLiteに保存した埋め込みの取り違え・順序の崩れ・モデル間の混同を突く。
+"""
+
+import pytest
+
+from app.vector_store.embedding_cache import EmbeddingCache
+
+
+class TestEmbeddingCacheAttacks:
+    """EmbeddingCache への攻撃"""
+    
+    @pytest.mark.adversarial
+    @pytest.mark.boundary
+    def test_round_trip_keeps_order_and_reports_misses(self, temp_dir):
+        """✅ 保存した埋め込みが入力と同じ順序で返り、未保存のテキストはNone"""
+        cache = EmbeddingCache(temp_dir / "embeddings.sqlite", "model")
+        cache.put_many(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+        
+        assert cache.get_many(["b", "missing", "a"]) == [[3.0, 4.0], None, [1.0, 2.0]]
+        cache.close()
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_entries_persist_across_instances(self, temp_dir):
+        """✅ 別のインスタンスから同じファイルを開いても取得できる"""
+        db_file = temp_dir / "embeddings.sqlite"
+        cache = EmbeddingCache(db_file, "model")
+        cache.put_many(["a"], [[0.5, -0.5]])
+        cache.close()
+        
+        reopened = EmbeddingCache(db_file, "model")
+        assert reopened.get_many(["a"]) == [[0.5, -0.5]]
+        reopened.close()
+    
+    @pytest.mark.adversarial
+    @pytest.mark.type_attack
+    def test_different_model_key_is_a_miss(self, temp_dir):
+        """✅ モデル（次元数を含むキー）が変わると以前の埋め込みを返さない"""
+        db_file = temp_dir / "embeddings.sqlite"
+        cache = EmbeddingCache(db_file, "text-embedding-3-small")
+        cache.put_many(["a"], [[1.0, 2.0, 3.0]])
+        
+        resized = EmbeddingCache(db_file, "text-embedding-3-small:2")
+        assert resized.get_many(["a"]) == [None], "次元数の違う埋め込みを返した！"
+        
+        cache.close()
+        resized.close()
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_lookup_beyond_query_batch_size(self, temp_dir):
+        """✅ 1回の問い合わせ件数を超えるキーでも全件取得できる"""
+        cache = EmbeddingCache(temp_dir / "embeddings.sqlite", "model")
+        texts = [f"text_{i}" for i in range(EmbeddingCache.QUERY_BATCH_SIZE + 10)]
+        cache.put_many(texts, [[float(i)] for i in range(len(texts))])
+        
+        assert cache.get_many(texts) == [[float(i)] for i in range(len(texts))]
+        cache.close()
+    
+    @pytest.mark.adversarial
+    @pytest.mark.resource_attack
+    def test_oldest_entries_are_evicted_beyond_max_entries(self, temp_dir, monkeypatch):
+        """✅ 上限件数を超えると古く書き込まれた埋め込みから削除される"""
+        monkeypatch.setattr(EmbeddingCache, "MAX_ENTRIES", 3)
+        cache = EmbeddingCache(temp_dir / "embeddings.sqlite", "model")
+        cache.put_many(["a", "b", "c"], [[1.0], [2.0], [3.0]])
+        
+        # 既存のキーを書き直すと新しい扱いになる
+        cache.put_many(["a"], [[1.5]])
+        cache.put_many(["d"], [[4.0]])
+        
+        assert cache.get_many(["a", "b", "c", "d"]) == [[1.5], None, [3.0], [4.0]], \
+            "古いエントリが削除されていない！"
+        cache.close()